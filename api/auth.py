@@ -1,107 +1,133 @@
 import asyncio
 
 import httpx
-from api.common import token_manager, URL, timeout
+from api.common import token_manager, URL, authorized_request
+from api.codec import response_json
 
 API_URL = URL+"auth"
 
 async def request_code(email: str):
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        try:
-            response = await client.post(url=f"{API_URL}/request_code", params={"email": email})
-            if response.status_code == 200:
-                response_data = response.json()
-                return response_data
-            else:
-                return {"request error": f"Ошибка запроса кода: {response.status_code}, {response.text}"}
-        except httpx.RequestError as e:
-            return {"request error": f"error while requesting the code: {e}"}
+    try:
+        response = await authorized_request("POST", f"{API_URL}/request_code", auth=False, params={"email": email})
+        if response.status_code == 200:
+            response_data = response_json(response)
+            return response_data
+        else:
+            return {"request error": f"Ошибка запроса кода: {response.status_code}, {response.text}"}
+    except httpx.RequestError as e:
+        return {"request error": f"error while requesting the code: {e}"}
 
 async def register(email: str, password: str, code: int):
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        try:
-            response = await client.post(
-                url=f"{API_URL}/register",
-                json={"email": email, "password": password},
-                params={"code": code}
-            )
-
-            if response.status_code == 201:
-                data = response.json()
-                token_manager.set_access_token(data.get("access_token"))
-                token_manager.set_refresh_token(response.cookies.get("refresh_token"))
-                return {"detail": "Successfully registered!"}
-            else:
-                return {"request error": f"Ошибка регистрации: {response.status_code}, {response.text}"}
-        except httpx.RequestError as e:
-            return {"request error": f"error while requesting the code: {e}"}
+    try:
+        response = await authorized_request(
+            "POST", f"{API_URL}/register",
+            auth=False,
+            json={"email": email, "password": password},
+            params={"code": code}
+        )
+
+        if response.status_code == 201:
+            data = response_json(response)
+            token_manager.set_access_token(data.get("access_token"))
+            token_manager.set_refresh_token(response.cookies.get("refresh_token"))
+            return {"detail": "Successfully registered!"}
+        else:
+            return {"request error": f"Ошибка регистрации: {response.status_code}, {response.text}"}
+    except httpx.RequestError as e:
+        return {"request error": f"error while requesting the code: {e}"}
 
 async def login(email: str, password: str):
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        try:
-            response = await client.post(
-                url=f"{API_URL}/login",
-                json={"email": email, "password": password}
-            )
-
-            if response.status_code == 200:
-                data = response.json()
-                token_manager.set_access_token(data.get("access_token"))
-                token_manager.set_refresh_token(response.cookies.get("refresh_token"))
-                return {"detail": "Successfully login!"}
-            elif response.status_code == 401:
-                return {{"request error": f"Ошибка авторизации: неверный пароль"}}
-            else:
-                return {"request error": f"Ошибка авторизации: {response.status_code}, {response.text}"}
-        except httpx.RequestError as e:
-            return {"request error": f"error while requesting the code: {e}"}
+    try:
+        response = await authorized_request(
+            "POST", f"{API_URL}/login",
+            auth=False,
+            json={"email": email, "password": password}
+        )
+
+        if response.status_code == 200:
+            data = response_json(response)
+            token_manager.set_access_token(data.get("access_token"))
+            token_manager.set_refresh_token(response.cookies.get("refresh_token"))
+            return {"detail": "Successfully login!"}
+        elif response.status_code == 401:
+            return {{"request error": f"Ошибка авторизации: неверный пароль"}}
+        else:
+            return {"request error": f"Ошибка авторизации: {response.status_code}, {response.text}"}
+    except httpx.RequestError as e:
+        return {"request error": f"error while requesting the code: {e}"}
+
+# Текущее обновление токенов: все одновременные 401 ждут один и тот же запрос
+_refresh_future: asyncio.Future | None = None
+
+
+def _on_refresh_done(future: asyncio.Future):
+    global _refresh_future
+    if _refresh_future is future:
+        _refresh_future = None
 
-async def refresh_tokens():
+
+async def refresh_tokens(stale_token: str | None = None):
+    """Обновление токенов в режиме single-flight.
+
+    stale_token — access-токен, с которым запрос получил 401. Если он уже
+    заменён, обновление прошло без нас и запрос можно сразу повторять.
+    """
+    global _refresh_future
+    if stale_token is not None and stale_token != token_manager.get_access_token():
+        return {"detail": "Tokens are updated"}
+    if _refresh_future is None:
+        _refresh_future = asyncio.ensure_future(_refresh_tokens())
+        _refresh_future.add_done_callback(_on_refresh_done)
+    return await asyncio.shield(_refresh_future)
+
+
+async def _refresh_tokens():
     refresh_token = token_manager.get_refresh_token()
     if not refresh_token:
         return {"request error": "No refresh token stored"}
 
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        try:
-            response = await client.post(
-                url = f"{API_URL}/refresh",
-                cookies={"refresh_token": refresh_token}
-            )
-
-            if response.status_code == 200:
-                data = response.json()
-                new_access_token = data.get("access_token")
-                new_refresh_token = response.cookies.get("refresh_token")
-
-                if new_access_token and new_refresh_token:
-                    token_manager.set_access_token(new_access_token)
-                    token_manager.set_refresh_token(new_refresh_token)
-                    return {"detail": "Tokens are updated"}
-                else:
-                    return {"error": "Error tokens updating"}
+    try:
+        response = await authorized_request(
+            "POST", f"{API_URL}/refresh",
+            auth=False,
+            headers={"Cookie": f"refresh_token={refresh_token}"}
+        )
+
+        if response.status_code == 200:
+            data = response_json(response)
+            new_access_token = data.get("access_token")
+            new_refresh_token = response.cookies.get("refresh_token")
+
+            if new_access_token and new_refresh_token:
+                token_manager.set_access_token(new_access_token)
+                token_manager.set_refresh_token(new_refresh_token)
+                return {"detail": "Tokens are updated"}
             else:
-                return {"error": f"Ошибка авторизации: {response.status_code}, {response.text}"}
-        except httpx.RequestError as e:
-            return {"request error": f"error while requesting the code: {e}"}
+                return {"error": "Error tokens updating"}
+        else:
+            return {"error": f"Ошибка авторизации: {response.status_code}, {response.text}"}
+    except httpx.RequestError as e:
+        return {"request error": f"error while requesting the code: {e}"}
 
 async def check_refresh_token_expired():
     refresh_token = token_manager.get_refresh_token()
     if not refresh_token:
         return {"request error": "No refresh token stored"}
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        try:
-            response = await client.get(
-                url = f"{API_URL}/check_refresh_token",
-                cookies={"refresh_token": refresh_token}
-            )
-
-            if response.status_code == 200:
-                data = response.json()
-                token_manager.set_access_token(data.get("access_token"))
-                return {"detail": "login success"}
-            elif response.status_code == 407:
-                return {"request error": "refresh token is expired"}
-            else:
-                return {"request error": f"{response.status_code} {response.text}"}
-        except httpx.RequestError as e:
-            return {"request error": f"error while requesting the code: {e}"}
\ No newline at end of file
+    try:
+        response = await authorized_request(
+            "GET", f"{API_URL}/check_refresh_token",
+            auth=False,
+            headers={"Cookie": f"refresh_token={refresh_token}"}
+        )
+
+        if response.status_code == 200:
+            data = response_json(response)
+            token_manager.set_access_token(data.get("access_token"))
+            return {"detail": "login success"}
+        elif response.status_code == 407:
+            return {"request error": "refresh token is expired"}
+        else:
+            return {"request error": f"{response.status_code} {response.text}"}
+    except httpx.RequestError as e:
+        # offline: сервер недоступен, но токен не отвергнут — можно работать с локальной копией
+        return {"request error": f"error while requesting the code: {e}", "offline": True}
\ No newline at end of file
@@ -0,0 +1,188 @@
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+from typing import Optional
+
+
+def user_cache_dir(app_name: str = "ZetCord") -> str:
+    """Каталог пользовательского кэша в зависимости от ОС."""
+    if sys.platform.startswith("win"):
+        base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), "AppData", "Local")
+        return os.path.join(base, app_name, "Cache")
+    if sys.platform == "darwin":
+        return os.path.join(os.path.expanduser("~/Library/Caches"), app_name)
+    return os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), app_name.lower())
+
+
+def _atomic_write(path: str, data: bytes):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+class AvatarCache:
+    """Дисковый кэш аватаров.
+
+    Файлы адресуются по sha256 содержимого, поэтому одинаковые аватары хранятся
+    один раз. Индекс user_id -> файл/ETag/Last-Modified держится в памяти и
+    сохраняется в index.json, размер каталога ограничен вытеснением LRU.
+    """
+
+    INDEX_NAME = "index.json"
+    SAVE_DELAY = 1.0
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = 50 * 1024 * 1024,
+                 revalidate_after: float = 600.0):
+        self.cache_dir = cache_dir or os.path.join(user_cache_dir(), "avatars")
+        self.max_bytes = max_bytes
+        self.revalidate_after = revalidate_after
+        self._entries: Optional[dict[str, dict]] = None
+        self._total_bytes = 0
+        self._save_handle: Optional[asyncio.TimerHandle] = None
+
+    # ================= Индекс =================
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.cache_dir, self.INDEX_NAME)
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, f"{digest}.jpg")
+
+    def _load(self) -> dict[str, dict]:
+        if self._entries is not None:
+            return self._entries
+        os.makedirs(self.cache_dir, exist_ok=True)
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as file:
+                entries = json.load(file).get("entries", {})
+        except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+            entries = {}
+        # Выбрасываем записи, файлы которых пропали с диска
+        self._entries = {user_id: entry for user_id, entry in entries.items()
+                         if os.path.isfile(self._blob_path(entry.get("hash", "")))}
+        self._total_bytes = sum(size for size in self._blob_sizes().values())
+        return self._entries
+
+    def _blob_sizes(self) -> dict[str, int]:
+        return {entry["hash"]: entry.get("size", 0) for entry in self._entries.values()}
+
+    def flush(self):
+        """Сохранить индекс на диск (атомарно)."""
+        if self._save_handle:
+            self._save_handle.cancel()
+            self._save_handle = None
+        if self._entries is None:
+            return
+        data = json.dumps({"entries": self._entries}, ensure_ascii=False).encode("utf-8")
+        try:
+            _atomic_write(self.index_path, data)
+        except OSError as e:
+            print(f"Ошибка при сохранении индекса аватаров: {e}")
+
+    def _schedule_save(self):
+        # Пачка изменений за SAVE_DELAY секунд сохраняется одной записью
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        if self._save_handle is None:
+            self._save_handle = loop.call_later(self.SAVE_DELAY, self.flush)
+
+    # ================= Чтение =================
+    def lookup(self, user_id) -> Optional[str]:
+        entry = self._load().get(str(user_id))
+        if entry is None:
+            return None
+        entry["last_access"] = time.time()
+        return self._blob_path(entry["hash"])
+
+    def needs_revalidation(self, user_id) -> bool:
+        entry = self._load().get(str(user_id))
+        return entry is None or time.time() - entry.get("checked_at", 0) > self.revalidate_after
+
+    def validators(self, user_id) -> dict:
+        """Заголовки условного запроса для ревалидации."""
+        entry = self._load().get(str(user_id))
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    # ================= Запись =================
+    def store(self, user_id, content: bytes, etag: Optional[str] = None,
+              last_modified: Optional[str] = None) -> str:
+        entries = self._load()
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._blob_path(digest)
+        sizes = self._blob_sizes()
+        if digest not in sizes:
+            if not os.path.isfile(path):
+                _atomic_write(path, content)
+            self._total_bytes += len(content)
+
+        previous = entries.get(str(user_id))
+        now = time.time()
+        entries[str(user_id)] = {
+            "hash": digest,
+            "size": len(content),
+            "etag": etag,
+            "last_modified": last_modified,
+            "checked_at": now,
+            "last_access": now,
+        }
+        if previous and previous["hash"] != digest:
+            self._drop_blob_if_unused(previous["hash"], previous.get("size", 0))
+        self._evict(keep=str(user_id))
+        self._schedule_save()
+        return path
+
+    def mark_fresh(self, user_id):
+        entry = self._load().get(str(user_id))
+        if entry:
+            entry["checked_at"] = time.time()
+            self._schedule_save()
+
+    def mark_stale(self, user_id):
+        entry = self._load().get(str(user_id))
+        if entry:
+            entry["checked_at"] = 0
+            self._schedule_save()
+
+    def invalidate(self, user_id):
+        entry = self._load().pop(str(user_id), None)
+        if entry:
+            self._drop_blob_if_unused(entry["hash"], entry.get("size", 0))
+            self._schedule_save()
+
+    def _drop_blob_if_unused(self, digest: str, size: int):
+        if any(entry["hash"] == digest for entry in self._entries.values()):
+            return
+        try:
+            os.remove(self._blob_path(digest))
+        except FileNotFoundError:
+            pass
+        self._total_bytes -= size
+
+    def _evict(self, keep: Optional[str] = None):
+        if self._total_bytes <= self.max_bytes:
+            return
+        for user_id, entry in sorted(self._entries.items(), key=lambda item: item[1].get("last_access", 0)):
+            if self._total_bytes <= self.max_bytes:
+                break
+            if user_id == keep:
+                continue
+            del self._entries[user_id]
+            self._drop_blob_if_unused(entry["hash"], entry.get("size", 0))
+
+
+avatar_cache = AvatarCache()
@@ -0,0 +1,54 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    # orjson необязателен: без него работаем на стандартном json
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    # Без msgpack WebSocket остаётся на текстовом JSON
+    msgpack = None
+
+BACKEND = "orjson" if orjson else "json"
+
+
+def loads(data):
+    """Разбор JSON из str или bytes."""
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps_bytes(obj) -> bytes:
+    """JSON в UTF-8 байтах (тело HTTP-запроса, бинарный кадр)."""
+    if orjson:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # Например, целые больше 64 бит — их умеет только стандартный json
+            pass
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps(obj) -> str:
+    """JSON строкой (текстовый кадр WebSocket)."""
+    if orjson:
+        return dumps_bytes(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def response_json(response):
+    """Замена httpx Response.json() на общем кодеке."""
+    return loads(response.content)
+
+
+def pack(obj) -> bytes:
+    """MessagePack для бинарных кадров WebSocket."""
+    return msgpack.packb(obj, use_bin_type=True)
+
+
+def unpack(data: bytes):
+    return msgpack.unpackb(data, raw=False, strict_map_key=False)
@@ -1,9 +1,214 @@
+import asyncio
+import email.utils
+import http.cookiejar
+import logging
+import os
+import random
+import time
+from datetime import datetime, timezone
+
 import httpx
 
+from . import codec
 from .token_manager import TokenManager
 #
 URL = "http://localhost:8000/"
 timeout = httpx.Timeout(30.0, read=20.0)
+# Пул keep-alive соединений общего клиента
+limits = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=30.0)
+http2 = False
+# Таймауты отдельных эндпоинтов (остальные используют общий timeout)
+endpoint_timeouts = {
+    "download_avatar": httpx.Timeout(5.0),
+    "refresh": httpx.Timeout(10.0),
+    "check_refresh_token": httpx.Timeout(10.0),
+}
 #
 
-token_manager = TokenManager()
\ No newline at end of file
+# ZETCORD_KEYRING=1 — хранить refresh-токен в системном keyring вместо token.json
+token_manager = TokenManager(use_keyring=os.environ.get("ZETCORD_KEYRING") == "1")
+
+_client: httpx.AsyncClient | None = None
+
+
+def configure_client(max_connections: int | None = None, max_keepalive_connections: int | None = None,
+                     keepalive_expiry: float | None = None, use_http2: bool | None = None):
+    """Настройка пула соединений. Вызывать до первого запроса."""
+    global limits, http2
+    limits = httpx.Limits(
+        max_connections=max_connections if max_connections is not None else limits.max_connections,
+        max_keepalive_connections=max_keepalive_connections if max_keepalive_connections is not None
+        else limits.max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry if keepalive_expiry is not None else limits.keepalive_expiry,
+    )
+    if use_http2 is not None:
+        http2 = use_http2
+    if _client is not None and not _client.is_closed:
+        logging.warning("HTTP-клиент уже создан, новые настройки пула применятся после close_client()")
+
+
+class _NoCookieJar(http.cookiejar.CookieJar):
+    """Jar, который ничего не сохраняет.
+
+    refresh_token приходит в Set-Cookie; в общем клиенте он уходил бы с каждым
+    запросом и переживал logout. Токен читается из response.cookies и
+    передаётся явно заголовком Cookie только в refresh.
+    """
+
+    def set_cookie(self, cookie):
+        pass
+
+    def extract_cookies(self, response, request):
+        pass
+
+
+def get_client() -> httpx.AsyncClient:
+    """Общий на всё приложение httpx-клиент (одно соединение на хост вместо нового на каждый запрос)."""
+    global _client
+    if _client is None or _client.is_closed:
+        use_http2 = http2
+        if use_http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logging.warning("Пакет h2 не установлен, HTTP/2 отключен")
+                use_http2 = False
+        _client = httpx.AsyncClient(timeout=timeout, limits=limits, http2=use_http2,
+                                    cookies=_NoCookieJar())
+    return _client
+
+
+async def close_client():
+    """Закрытие общего клиента при выходе из приложения."""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+
+# ================= Авторизованные запросы =================
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+TRANSIENT_STATUS_CODES = {429, 502, 503, 504}
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.3
+BACKOFF_MAX = 5.0
+RETRY_AFTER_MAX = 30.0
+
+
+class EndpointStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "avg_ms": self.total_time / self.requests * 1000 if self.requests else 0.0,
+            "max_ms": self.max_time * 1000,
+        }
+
+
+request_stats: dict[str, EndpointStats] = {}
+
+
+def get_request_stats() -> dict[str, dict]:
+    """Снимок счётчиков задержек и ошибок по эндпоинтам."""
+    return {endpoint: stats.as_dict() for endpoint, stats in request_stats.items()}
+
+
+def _retry_after_delay(response: httpx.Response) -> float | None:
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            retry_at = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        delay = (retry_at - datetime.now(timezone.utc)).total_seconds()
+    return min(max(delay, 0.0), RETRY_AFTER_MAX)
+
+
+def _backoff_delay(attempt: int) -> float:
+    # Экспоненциальная задержка с полным джиттером
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+async def authorized_request(method: str, url: str, *, endpoint: str | None = None, auth: bool = True,
+                             idempotent: bool | None = None, max_retries: int = MAX_RETRIES,
+                             request_timeout: httpx.Timeout | float | None = None, headers: dict | None = None,
+                             **kwargs) -> httpx.Response:
+    """Единая точка для запросов к API.
+
+    Подставляет Bearer-токен и один раз повторяет запрос после обновления токенов на 401.
+    Идемпотентные запросы повторяются на сетевых ошибках и 429/502/503/504
+    с экспоненциальной задержкой и учётом Retry-After. Исключение httpx после
+    последней попытки пробрасывается вызывающему.
+    """
+    method = method.upper()
+    endpoint = endpoint or url.rsplit("/", 1)[-1]
+    if idempotent is None:
+        idempotent = method in IDEMPOTENT_METHODS
+    if request_timeout is None:
+        request_timeout = endpoint_timeouts.get(endpoint, timeout)
+    stats = request_stats.setdefault(endpoint, EndpointStats())
+    client = get_client()
+    if "json" in kwargs:
+        # Тело кодируем общим кодеком (orjson, если есть) один раз на все повторы
+        kwargs["content"] = codec.dumps_bytes(kwargs.pop("json"))
+        headers = {"Content-Type": "application/json", **(headers or {})}
+
+    refreshed = False
+    attempt = 0
+    while True:
+        request_headers = dict(headers or {})
+        access_token = token_manager.get_access_token() if auth else None
+        if auth:
+            request_headers["Authorization"] = f"Bearer {access_token}"
+
+        started = time.perf_counter()
+        stats.requests += 1
+        try:
+            response = await client.request(method, url, headers=request_headers, timeout=request_timeout,
+                                            **kwargs)
+        except httpx.TransportError as e:
+            elapsed = time.perf_counter() - started
+            stats.total_time += elapsed
+            stats.max_time = max(stats.max_time, elapsed)
+            stats.errors += 1
+            if not idempotent or attempt >= max_retries:
+                raise
+            delay = _backoff_delay(attempt)
+            logging.warning(f"{method} {endpoint}: {type(e).__name__}, повтор через {delay:.2f} с")
+        else:
+            elapsed = time.perf_counter() - started
+            stats.total_time += elapsed
+            stats.max_time = max(stats.max_time, elapsed)
+            if response.status_code >= 400:
+                stats.errors += 1
+
+            if response.status_code == 401 and auth and not refreshed:
+                # Запрос отклонён целиком — повтор безопасен и для неидемпотентных методов
+                refreshed = True
+                await token_manager.refresh(stale_token=access_token)
+                continue
+
+            if response.status_code not in TRANSIENT_STATUS_CODES or not idempotent or attempt >= max_retries:
+                return response
+            delay = _retry_after_delay(response)
+            if delay is None:
+                delay = _backoff_delay(attempt)
+            logging.warning(f"{method} {endpoint}: {response.status_code}, повтор через {delay:.2f} с")
+
+        attempt += 1
+        stats.retries += 1
+        await asyncio.sleep(delay)
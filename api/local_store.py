@@ -0,0 +1,258 @@
+import functools
+import json
+import os
+import sqlite3
+from typing import Optional
+
+from api.avatar_cache import user_cache_dir
+
+
+def _guarded(default=None):
+    """База — только кэш: ошибка SQLite не должна ронять интерфейс."""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            try:
+                return method(*args, **kwargs)
+            except (sqlite3.Error, OSError, ValueError) as e:
+                print(f"Ошибка локальной базы ({method.__name__}): {e}")
+                return default() if callable(default) else default
+        return wrapper
+    return decorator
+
+
+def apply_init_delta(snapshot: dict, delta: dict) -> dict:
+    """Применить дельту init к сохранённому снимку.
+
+    В дельте приходят только изменившиеся чаты и группы (целиком), id удалённых
+    в removed_chat_ids и profile_data, если профиль менялся. Если рядом со
+    списком есть order — id всех чатов в порядке сервера, — итог строится по нему;
+    иначе изменившиеся чаты (сервер шлёт их от свежих к старым) встают в начало.
+    """
+    result = dict(snapshot)
+    if delta.get("profile_data"):
+        result["profile_data"] = delta["profile_data"]
+    removed = {str(chat_id) for chat_id in delta.get("removed_chat_ids") or []}
+    for key, list_key in (("chats_data", "chats"), ("groups_data", "groups")):
+        section = delta.get(key) or {}
+        current = {str(chat.get("_id")): chat for chat in (snapshot.get(key) or {}).get(list_key) or []
+                   if str(chat.get("_id")) not in removed}
+        changed = {str(chat.get("_id")): chat for chat in section.get(list_key) or []}
+        order = section.get("order")
+        if order is not None:
+            merged = [changed.get(str(chat_id)) or current.get(str(chat_id)) for chat_id in order]
+            merged = [chat for chat in merged if chat is not None]
+        else:
+            merged = list(changed.values()) + [chat for chat_id, chat in current.items() if chat_id not in changed]
+        result[key] = {list_key: merged}
+    return result
+
+
+class LocalStore:
+    """Локальная копия чатов, сообщений и профилей в SQLite.
+
+    При запуске из неё сразу рисуются диалоги и последние сообщения, пока
+    сервер не ответил на init. Журнал WAL, чтобы запись не блокировала чтение.
+    """
+
+    # Сколько последних сообщений каждого чата хранить на диске
+    MESSAGES_PER_CHAT = 500
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        CREATE TABLE IF NOT EXISTS chats (
+            chat_id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            data TEXT NOT NULL,
+            last_message TEXT
+        );
+        CREATE TABLE IF NOT EXISTS messages (
+            message_id TEXT PRIMARY KEY,
+            chat_id TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS messages_chat_timestamp ON messages (chat_id, timestamp);
+        CREATE TABLE IF NOT EXISTS profiles (
+            user_id TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.path.join(user_cache_dir(), "local_store.sqlite3")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._profiles: Optional[dict[str, dict]] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(self.SCHEMA)
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    @_guarded()
+    def clear(self):
+        """Стереть всё (выход из аккаунта)."""
+        with self.conn:
+            for table in ("meta", "chats", "messages", "profiles"):
+                self.conn.execute(f"DELETE FROM {table}")
+        self._profiles = None
+
+    def _get_meta(self, key: str):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _set_meta(self, key: str, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                          (key, json.dumps(value, ensure_ascii=False)))
+
+    # ================= init =================
+    @_guarded(bool)
+    def has_snapshot(self) -> bool:
+        """Есть ли сохранённый init — можно показать главное окно до ответа сервера."""
+        return self._get_meta("profile_data") is not None
+
+    @_guarded()
+    def save_init(self, data: dict):
+        """Сохранить снимок init: профиль, диалоги, группы."""
+        profile_data = data.get("profile_data") or {}
+        owner_id = profile_data.get("id")
+        if self._get_meta("owner_id") not in (None, owner_id):
+            # Вошёл другой пользователь — чужая переписка не нужна
+            self.clear()
+        chats = (data.get("chats_data") or {}).get("chats") or []
+        groups = (data.get("groups_data") or {}).get("groups") or []
+        rows = [(str(chat.get("_id")), "chat", position, json.dumps(chat, ensure_ascii=False),
+                 json.dumps(chat.get("last_message"), ensure_ascii=False))
+                for position, chat in enumerate(chats)]
+        rows += [(str(group.get("_id")), "group", position, json.dumps(group, ensure_ascii=False),
+                  json.dumps(group.get("last_message"), ensure_ascii=False))
+                 for position, group in enumerate(groups)]
+        with self.conn:
+            self._set_meta("owner_id", owner_id)
+            self._set_meta("profile_data", profile_data)
+            self.conn.execute("DELETE FROM chats")
+            self.conn.executemany(
+                "INSERT INTO chats (chat_id, kind, position, data, last_message) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            # Сообщения удалённых чатов больше не покажем
+            self.conn.execute("DELETE FROM messages WHERE chat_id NOT IN (SELECT chat_id FROM chats)")
+
+    @_guarded()
+    def load_init(self) -> Optional[dict]:
+        """Снимок init в том же виде, что присылает сервер, или None."""
+        profile_data = self._get_meta("profile_data")
+        if not profile_data:
+            return None
+        chats, groups = [], []
+        for kind, data, last_message in self.conn.execute(
+                "SELECT kind, data, last_message FROM chats ORDER BY kind, position"):
+            chat = json.loads(data)
+            chat["last_message"] = json.loads(last_message) if last_message else None
+            (chats if kind == "chat" else groups).append(chat)
+        return {
+            "profile_data": profile_data,
+            "chats_data": {"chats": chats},
+            "groups_data": {"groups": groups},
+        }
+
+    @_guarded()
+    def update_last_message(self, chat_id, message: dict):
+        with self.conn:
+            self.conn.execute("UPDATE chats SET last_message = ? WHERE chat_id = ?",
+                              (json.dumps(message, ensure_ascii=False), str(chat_id)))
+
+    @_guarded(dict)
+    def sync_cursor(self) -> dict:
+        """Последнее известное сообщение каждого чата — курсор для дельты в init."""
+        cursor = {}
+        for chat_id, last_message in self.conn.execute("SELECT chat_id, last_message FROM chats"):
+            message = json.loads(last_message) if last_message else None
+            if isinstance(message, dict) and message.get("timestamp"):
+                cursor[chat_id] = {"last_message_id": message.get("_id"), "last_timestamp": message["timestamp"]}
+        # В SQLite голые столбцы при MAX() берутся из строки с максимумом
+        for chat_id, message_id, timestamp in self.conn.execute(
+                "SELECT chat_id, message_id, MAX(timestamp) FROM messages GROUP BY chat_id"):
+            known = cursor.get(chat_id)
+            if known is None or timestamp > known["last_timestamp"]:
+                cursor[chat_id] = {"last_message_id": message_id, "last_timestamp": timestamp}
+        return {"chats": cursor}
+
+    # ================= Сообщения =================
+    @staticmethod
+    def _message_id(chat_id, message: dict) -> str:
+        message_id = message.get("_id")
+        if message_id is not None:
+            return str(message_id)
+        return f"{chat_id}:{message.get('timestamp')}:{message.get('sender_id')}"
+
+    @_guarded()
+    def save_messages(self, chat_id, messages: list[dict]):
+        if not messages:
+            return
+        chat_id = str(chat_id)
+        rows = [(self._message_id(chat_id, message), chat_id, message.get("timestamp") or "",
+                 json.dumps(message, ensure_ascii=False))
+                for message in messages]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO messages (message_id, chat_id, timestamp, data) VALUES (?, ?, ?, ?)", rows
+            )
+            self.conn.execute(
+                "DELETE FROM messages WHERE chat_id = ? AND message_id NOT IN ("
+                "SELECT message_id FROM messages WHERE chat_id = ? ORDER BY timestamp DESC LIMIT ?)",
+                (chat_id, chat_id, self.MESSAGES_PER_CHAT),
+            )
+
+    @_guarded(list)
+    def recent_messages(self, chat_id, limit: int) -> list[dict]:
+        """Последние сообщения чата, новые первыми — как в ответе chat_history."""
+        rows = self.conn.execute(
+            "SELECT data FROM messages WHERE chat_id = ? ORDER BY timestamp DESC LIMIT ?",
+            (str(chat_id), limit),
+        ).fetchall()
+        return [json.loads(data) for data, in rows]
+
+    # ================= Профили =================
+    def _load_profiles(self) -> dict[str, dict]:
+        if self._profiles is None:
+            self._profiles = {user_id: json.loads(data)
+                              for user_id, data in self.conn.execute("SELECT user_id, data FROM profiles")}
+        return self._profiles
+
+    @_guarded()
+    def get_profile(self, user_id) -> Optional[dict]:
+        return self._load_profiles().get(str(user_id))
+
+    def get_nickname(self, user_id) -> Optional[str]:
+        profile = self.get_profile(user_id)
+        return profile.get("nickname") if profile else None
+
+    @_guarded()
+    def save_profiles(self, profiles: list[dict]):
+        profiles = [profile for profile in profiles
+                    if isinstance(profile, dict) and profile.get("id") is not None and "request error" not in profile]
+        if not profiles:
+            return
+        cached = self._load_profiles()
+        with self.conn:
+            for profile in profiles:
+                cached[str(profile["id"])] = profile
+                self.conn.execute("INSERT OR REPLACE INTO profiles (user_id, data) VALUES (?, ?)",
+                                  (str(profile["id"]), json.dumps(profile, ensure_ascii=False)))
+
+
+local_store = LocalStore()
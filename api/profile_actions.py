@@ -1,196 +1,221 @@
-import os
+import asyncio
 
-import httpx
-from api.auth import refresh_tokens
-from api.common import token_manager, URL, timeout
+from api.avatar_cache import avatar_cache
+from api.common import URL, authorized_request
+from api.codec import response_json
+from api.profile_cache import profile_cache
 from pathlib import Path
 
 API_URL = URL + "user"
 
 async def edit_unique_name(unique_name: str):
-    headers = {
-        "Authorization": f"Bearer {token_manager.get_access_token()}"
-    }
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        response = await client.post(
-            url=f"{API_URL}/edit_unique_name",
-            params={"name": unique_name},
-            headers=headers
-        )
-        if response.status_code == 200:
-            return {"detail": "unique name updated"}
-        elif response.status_code == 401:
-            await refresh_tokens()
-            headers["Authorization"] = f"Bearer {token_manager.get_access_token()}"
-            response = await client.post(
-                url=f"{API_URL}/edit_unique_name",
-                params={"name": unique_name},
-                headers=headers
-            )
-            if response.status_code == 200:
-                return {"detail": "unique name updated"}
-        return {"error": f"code: {response.status_code}, detail: {response.text}"}
+    response = await authorized_request(
+        "POST", f"{API_URL}/edit_unique_name",
+        params={"name": unique_name}
+    )
+    if response.status_code == 200:
+        return {"detail": "unique name updated"}
+    return {"error": f"code: {response.status_code}, detail: {response.text}"}
 
 async def edit_nickname(nickname: str):
-    headers = {
-        "Authorization": f"Bearer {token_manager.get_access_token()}"
-    }
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        response = await client.post(
-            url=f"{API_URL}/edit_nickname",
-            params={"nickname": nickname},
-            headers=headers
+    response = await authorized_request(
+        "POST", f"{API_URL}/edit_nickname",
+        params={"nickname": nickname}
+    )
+    if response.status_code == 200:
+        return {"detail": "Name updated"}
+    return {"error": f"code: {response.status_code}, detail: {response.text}"}
+
+async def upload_avatar(filepath: str):
+    # Читаем файл целиком, чтобы тело можно было отправить повторно после обновления токена
+    with open(filepath, "rb") as f:
+        content = f.read()
+    response = await authorized_request(
+        "POST", f"{API_URL}/upload_avatar",
+        files={"file": ("avatar.jpg", content, "image/jpeg")}
+    )
+    if response.status_code == 200:
+        return {"detail": "Avatar uploaded"}
+    return {"error": response.text}
+
+def get_avatar_path(user_profile_id: int) -> str | None:
+    """Путь к аватару из дискового кэша или None, если его ещё не скачивали."""
+    if user_profile_id is None:
+        return None
+    return avatar_cache.lookup(user_profile_id)
+
+async def download_avatar(user_profile_id: int) -> str | None:
+    if user_profile_id is None:
+        return None
+    cached_path = avatar_cache.lookup(user_profile_id)
+    if cached_path and not avatar_cache.needs_revalidation(user_profile_id):
+        return cached_path
+
+    try:
+        response = await authorized_request(
+            "GET", f"{API_URL}/avatar/{user_profile_id}",
+            endpoint="download_avatar",
+            headers=avatar_cache.validators(user_profile_id)
         )
+        if response.status_code == 304 and cached_path:
+            avatar_cache.mark_fresh(user_profile_id)
+            return cached_path
         if response.status_code == 200:
-            return {"detail": "Name updated"}
-        elif response.status_code == 401:
-            await refresh_tokens()
-            headers["Authorization"] = f"Bearer {token_manager.get_access_token()}"
-            response = await client.post(
-                url=f"{API_URL}/edit_nickname",
-                params={"nickname": nickname},
-                headers=headers
+            return avatar_cache.store(
+                user_profile_id,
+                response.content,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified")
             )
-            if response.status_code == 200:
-                return {"detail": "Name updated"}
-        return {"error": f"code: {response.status_code}, detail: {response.text}"}
+        if response.status_code == 404:
+            avatar_cache.invalidate(user_profile_id)
+            return None
+        return cached_path
+    except Exception as e:
+        print(f"Ошибка при загрузке аватара: {e}")
+        # Без сети показываем то, что уже есть в кэше
+        return cached_path
 
-async def upload_avatar(filepath: str):
-    headers = {
-        "Authorization": f"Bearer {token_manager.get_access_token()}"
-    }
+async def get_current_user():
+    response = await authorized_request("GET", f"{API_URL}/me")
 
-    with open(filepath, "rb") as f:
-        files = {"file": ("avatar.jpg", f, "image/jpeg")}
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.post(
-                url=f"{API_URL}/upload_avatar",
-                headers=headers,
-                files=files
-            )
-            if response.status_code == 200:
-                return {"detail": "Avatar uploaded"}
-            elif response.status_code == 401:
-                await refresh_tokens()
-                headers["Authorization"] = f"Bearer {token_manager.get_access_token()}"
-                with open(filepath, "rb") as f_retry:
-                    files = {"file": ("avatar.jpg", f_retry, "image/jpeg")}
-                    response = await client.post(
-                        url=f"{API_URL}/upload_avatar",
-                        headers=headers,
-                        files=files
-                    )
-                    if response.status_code == 200:
-                        return {"detail": "Avatar uploaded"}
-            return {"error": response.text}
-
-def get_avatar_path(user_profile_id: int):
-    cache_dir = "avatar"
-    avatar_path = os.path.join(cache_dir ,f"{user_profile_id}.jpg")
-    if os.path.exists(avatar_path):
-        print("ава уже есть вот путь", avatar_path)
-        return avatar_path
+    if response.status_code == 200:
+        return response_json(response)
+    elif response.status_code == 401:
+        return {"request error": "Unauthorized even after token refresh"}
     else:
-        return 1
+        return {"request error": response.text}
 
-async def download_avatar(user_profile_id: int) -> str | None:
-    headers = {
-        "Authorization": f"Bearer {token_manager.get_access_token()}"
-    }
+async def get_user_info(user_id: int):
+    response = await authorized_request("GET", f"{API_URL}/get_user_info", params={"user_id": user_id})
+
+    if response.status_code == 200:
+        return response_json(response)
+    elif response.status_code == 403:
+        return {"request error": "user not in this chat"}
+    elif response.status_code == 401:
+        return {"request error": "Unauthorized even after token refresh"}
+    else:
+        return {"request error": response.text}
 
-    avatar_path = get_avatar_path(user_profile_id)
-    if avatar_path != 1:
-        return avatar_path
-    print("иду дальше чем вызов get_avatar_path")
+async def get_users_info(user_ids: list[int]):
+    """Пакетный запрос профилей. None, если сервер не поддерживает пакетный эндпоинт."""
+    response = await authorized_request("GET", f"{API_URL}/get_users_info", params={"user_ids": user_ids})
 
-    async with httpx.AsyncClient(timeout=timeout) as client:
+    if response.status_code == 200:
+        return {profile.get("id"): profile for profile in response_json(response)}
+    elif response.status_code in (404, 405):
+        return None
+    else:
+        return {"request error": response.text}
+
+
+class ProfileLoader:
+    """Загрузчик профилей в стиле DataLoader.
+
+    Запросы, сделанные за один проход цикла событий, склеиваются в одну пачку,
+    одновременные запросы одного id ждут один и тот же future.
+    """
+
+    # После стольких ошибок пакетного эндпоинта подряд перестаём его вызывать
+    BULK_FAILURE_LIMIT = 3
+
+    def __init__(self, max_concurrency: int = 8):
+        self.max_concurrency = max_concurrency
+        self._bulk_supported = True
+        self._bulk_failures = 0
+        self._in_flight: dict[int, asyncio.Future] = {}
+        self._queue: list[int] = []
+        self._dispatch_scheduled = False
+
+    async def load(self, user_id: int) -> dict:
+        cached = profile_cache.get(user_id)
+        if cached is not None:
+            return cached
+        future = self._in_flight.get(user_id)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._in_flight[user_id] = future
+            self._queue.append(user_id)
+            if not self._dispatch_scheduled:
+                self._dispatch_scheduled = True
+                loop.call_soon(self._dispatch)
+        # shield: отмена одного ожидающего не должна отменять общий запрос
+        return await asyncio.shield(future)
+
+    async def load_many(self, user_ids: list[int]) -> list[dict]:
+        return await asyncio.gather(*(self.load(user_id) for user_id in user_ids))
+
+    def _dispatch(self):
+        self._dispatch_scheduled = False
+        batch, self._queue = self._queue, []
+        if batch:
+            asyncio.ensure_future(self._run_batch(batch))
+
+    async def _run_batch(self, batch: list[int]):
         try:
-            response = await client.get(
-                url=f"{API_URL}/avatar/{str(user_profile_id)}",
-                headers=headers,
-                timeout=1
-            )
-            if response.status_code == 200:
-                with open(avatar_path, "wb") as f:
-                    f.write(response.content)
-                return avatar_path
-            elif response.status_code == 401:
-                await refresh_tokens()
-                headers["Authorization"] = f"Bearer {token_manager.get_access_token()}"
-                response = await client.get(
-                    url=f"{API_URL}/avatar/{user_profile_id}",
-                    headers=headers
-                )
-                if response.status_code == 200:
-                    with open(avatar_path, "wb") as f:
-                        f.write(response.content)
-                    return avatar_path
-            return None
+            if len(batch) > 1 and self._bulk_supported:
+                profiles = await get_users_info(batch)
+                if profiles is None:
+                    # Пакетного эндпоинта нет — дальше только параллельные одиночные запросы
+                    self._bulk_supported = False
+                elif "request error" in profiles:
+                    # Пакетный запрос не удался — эту пачку добираем одиночными
+                    self._bulk_failures += 1
+                    if self._bulk_failures >= self.BULK_FAILURE_LIMIT:
+                        self._bulk_supported = False
+                    print(f"Пакетная загрузка профилей не удалась: {profiles['request error']}")
+                else:
+                    self._bulk_failures = 0
+                    for user_id in batch:
+                        self._resolve(user_id, result=profiles.get(user_id, {"request error": "user not found"}))
+                    return
+            await self._fan_out(batch)
         except Exception as e:
-            print(f"Ошибка при загрузке аватара: {e}")
-            return None
+            for user_id in batch:
+                self._resolve(user_id, error=e)
+
+    async def _fan_out(self, batch: list[int]):
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def fetch(user_id):
+            try:
+                async with semaphore:
+                    self._resolve(user_id, result=await get_user_info(user_id))
+            except Exception as e:
+                self._resolve(user_id, error=e)
+
+        await asyncio.gather(*(fetch(user_id) for user_id in batch))
+
+    def _resolve(self, user_id, result=None, error=None):
+        future = self._in_flight.pop(user_id, None)
+        if future is None or future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            profile_cache.set(user_id, result)
+            future.set_result(result)
 
-async def get_current_user():
-    headers = {
-        "Authorization": f"Bearer {token_manager.get_access_token()}"
-    }
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        response = await client.get(url=f"{API_URL}/me", headers=headers)
 
-        if response.status_code == 200:
-            return response.json()
-        elif response.status_code == 401:
-            await refresh_tokens()
-            headers["Authorization"] = f"Bearer {token_manager.get_access_token()}"
-            response = await client.get(url=f"{API_URL}/me", headers=headers)
-
-            if response.status_code == 200:
-                return response.json()
-            else:
-                return {"request error": "Unauthorized even after token refresh"}
-        else:
-            return {"request error": response.text}
+profile_loader = ProfileLoader()
 
-async def get_user_info(user_id: int):
-    headers = {
-        "Authorization": f"Bearer {token_manager.get_access_token()}"
-    }
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        response = await client.get(url=f"{API_URL}/get_user_info", headers=headers, params={"user_id": user_id})
 
-        if response.status_code == 200:
-            return response.json()
-        elif response.status_code == 403:
-            return {"request error": "user not in this chat"}
-        elif response.status_code == 401:
-            await refresh_tokens()
-            headers["Authorization"] = f"Bearer {token_manager.get_access_token()}"
-            response = await client.get(url=f"{API_URL}/get_user_info", headers=headers, params={"user_id": user_id})
-            if response.status_code == 200:
-                return response.json()
-            else:
-                return {"request error": "Unauthorized even after token refresh"}
-        else:
-            return {"request error": response.text}
+async def load_user_info(user_id: int):
+    return await profile_loader.load(user_id)
 
 async def search_user(unique_name: str):
-    headers = {
-        "Authorization": f"Bearer {token_manager.get_access_token()}"
-    }
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        response = await client.get(url=f"{API_URL}/get_user/{unique_name}", headers=headers, params={"user_unique_name": unique_name})
-        if response.status_code == 200:
-            return response.json()
-        elif response.status_code == 404:
-            return {"request error": "User not found"}
-        elif response.status_code == 401:
-            await refresh_tokens()
-            headers["Authorization"] = f"Bearer {token_manager.get_access_token()}"
-            response = await client.get(url=f"{API_URL}/get_user/{unique_name}", headers=headers,
-                                        params={"user_unique_name": unique_name})
-            if response.status_code == 200:
-                return response.json()
-            else:
-                return {"request error": "Unauthorized even after token refresh"}
-        else:
-            return {"request error": response.text}
\ No newline at end of file
+    response = await authorized_request(
+        "GET", f"{API_URL}/get_user/{unique_name}",
+        endpoint="search_user",
+        params={"user_unique_name": unique_name}
+    )
+    if response.status_code == 200:
+        return response_json(response)
+    elif response.status_code == 404:
+        return {"request error": "User not found"}
+    elif response.status_code == 401:
+        return {"request error": "Unauthorized even after token refresh"}
+    else:
+        return {"request error": response.text}
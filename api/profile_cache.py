@@ -0,0 +1,50 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class ProfileCache:
+    """Общий на всё приложение кэш профилей пользователей (TTL + вытеснение LRU)."""
+
+    def __init__(self, max_size: int = 512, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[int, tuple[float, dict]] = OrderedDict()
+
+    def get(self, user_id: int) -> Optional[dict]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        stored_at, profile = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._entries[user_id]
+            return None
+        self._entries.move_to_end(user_id)
+        return profile
+
+    def get_nickname(self, user_id: int) -> Optional[str]:
+        profile = self.get(user_id)
+        return profile.get("nickname") if profile else None
+
+    def set(self, user_id: int, profile: dict):
+        if not profile or "request error" in profile:
+            return
+        self._entries[user_id] = (time.monotonic(), profile)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        self._entries.pop(user_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __contains__(self, user_id: int) -> bool:
+        return self.get(user_id) is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+profile_cache = ProfileCache()
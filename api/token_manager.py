@@ -1,43 +1,171 @@
+import asyncio
+import base64
 import json
-import os.path
+import os
+import time
+
+import keyring
+import keyring.errors
+from typing import Optional, Callable, Awaitable
+
+# token.json лежит в корне проекта, независимо от текущей директории
+TOKEN_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "token.json")
 
-import keyring  # пока не используется, но пригодится
-from typing import Optional
 
 class TokenManager:
     SERVICE_NAME = "ZETCORD"
+    KEYRING_USERNAME = "refresh_token"
+    # За сколько секунд до истечения access-токена обновлять его в фоне
+    REFRESH_MARGIN = 30.0
 
-    def __init__(self):
+    def __init__(self, token_path: str = TOKEN_PATH, use_keyring: bool = False):
         self.access_token: Optional[str] = None
+        self.token_path = token_path
+        self.use_keyring = use_keyring
+        self._refresh_token: Optional[str] = None
+        self._refresh_token_loaded = False
+        self._refresh_callback: Optional[Callable[[], Awaitable]] = None
+        self._refresh_handle: Optional[asyncio.TimerHandle] = None
+        self._access_token_listeners: list[Callable[[Optional[str]], None]] = []
 
     def set_access_token(self, token: str):
         self.access_token = token
+        self._schedule_refresh()
+        for listener in list(self._access_token_listeners):
+            try:
+                listener(token)
+            except Exception as e:
+                print("Ошибка в подписчике на обновление токена:", e)
 
     def get_access_token(self) -> Optional[str]:
         return self.access_token
 
     def clear_access_token(self):
         self.access_token = None
+        self._cancel_scheduled_refresh()
+
+    def set_refresh_callback(self, callback: Callable[[], Awaitable]):
+        """Заменить корутину обновления токенов (по умолчанию api.auth.refresh_tokens)."""
+        self._refresh_callback = callback
+
+    def _get_refresh_callback(self) -> Callable[[], Awaitable]:
+        # Импорт ленивый: api.auth сам импортирует token_manager через api.common
+        if self._refresh_callback is None:
+            from api.auth import refresh_tokens
+            self._refresh_callback = refresh_tokens
+        return self._refresh_callback
+
+    async def refresh(self, stale_token: Optional[str] = None):
+        """Обновление токенов (single-flight в api.auth)."""
+        return await self._get_refresh_callback()(stale_token=stale_token)
+
+    def add_access_token_listener(self, listener: Callable[[Optional[str]], None]):
+        self._access_token_listeners.append(listener)
+
+    def remove_access_token_listener(self, listener: Callable[[Optional[str]], None]):
+        if listener in self._access_token_listeners:
+            self._access_token_listeners.remove(listener)
+
+    @staticmethod
+    def decode_claims(token: Optional[str]) -> dict:
+        """Payload JWT без проверки подписи — нужен только срок жизни."""
+        try:
+            payload = token.split(".")[1]
+            payload += "=" * (-len(payload) % 4)
+            claims = json.loads(base64.urlsafe_b64decode(payload))
+            return claims if isinstance(claims, dict) else {}
+        except (AttributeError, IndexError, ValueError):
+            return {}
+
+    def get_access_token_expiry(self) -> Optional[float]:
+        exp = self.decode_claims(self.access_token).get("exp")
+        return float(exp) if isinstance(exp, (int, float)) else None
+
+    def _schedule_refresh(self):
+        self._cancel_scheduled_refresh()
+        claims = self.decode_claims(self.access_token)
+        exp = claims.get("exp")
+        if not isinstance(exp, (int, float)):
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        margin = self.REFRESH_MARGIN
+        iat = claims.get("iat")
+        if isinstance(iat, (int, float)) and exp > iat:
+            # Для короткоживущих токенов не обновляем раньше последней пятой части срока
+            margin = min(margin, (exp - iat) / 5)
+        delay = max(exp - time.time() - margin, 0.0)
+        self._refresh_handle = loop.call_later(delay, self._run_scheduled_refresh)
+
+    def _cancel_scheduled_refresh(self):
+        if self._refresh_handle:
+            self._refresh_handle.cancel()
+            self._refresh_handle = None
+
+    def _run_scheduled_refresh(self):
+        self._refresh_handle = None
+        asyncio.ensure_future(self._get_refresh_callback()())
 
     def set_refresh_token(self, token: str):
-        data = {"refresh_token": token}
-        with open("token.json", "w", encoding="utf-8") as file:
-            json.dump(data, file, ensure_ascii=False, indent=1)
+        self._refresh_token = token
+        self._refresh_token_loaded = True
+        self._store_refresh_token(token)
 
     def get_refresh_token(self) -> Optional[str]:
+        # Файл/keyring читаем один раз, дальше токен живёт в памяти
+        if not self._refresh_token_loaded:
+            self._refresh_token = self._load_refresh_token()
+            self._refresh_token_loaded = True
+        return self._refresh_token
+
+    def clear_refresh_token(self):
+        try:
+            self.set_refresh_token(None)
+        except Exception as e:
+            print("Ошибка при очистке refresh токена:", e)
+
+    def storage_exists(self) -> bool:
+        if self.use_keyring:
+            return self.get_refresh_token() is not None
+        return os.path.isfile(self.token_path)
+
+    def _load_refresh_token(self) -> Optional[str]:
+        if self.use_keyring:
+            try:
+                return keyring.get_password(self.SERVICE_NAME, self.KEYRING_USERNAME)
+            except Exception as e:
+                print("keyring недоступен, используется token.json:", e)
+                self.use_keyring = False
         try:
-            with open("token.json", "r", encoding="utf-8") as file:
+            with open(self.token_path, "r", encoding="utf-8") as file:
                 data = json.load(file)
                 return data.get("refresh_token")
         except (FileNotFoundError, json.JSONDecodeError):
             return None
 
-    def clear_refresh_token(self):
-        try:
-            with open("token.json", "w", encoding="utf-8") as file:
-                json.dump({"refresh_token": None}, file, ensure_ascii=False, indent=1)
-        except Exception as e:
-            print("Ошибка при очистке refresh токена:", e)
+    def _store_refresh_token(self, token: Optional[str]):
+        if self.use_keyring:
+            try:
+                if token:
+                    keyring.set_password(self.SERVICE_NAME, self.KEYRING_USERNAME, token)
+                else:
+                    try:
+                        keyring.delete_password(self.SERVICE_NAME, self.KEYRING_USERNAME)
+                    except keyring.errors.PasswordDeleteError:
+                        pass
+                return
+            except Exception as e:
+                print("keyring недоступен, используется token.json:", e)
+                self.use_keyring = False
+        # Пишем во временный файл и атомарно подменяем: читатель никогда не увидит полузаписанный json
+        tmp_path = f"{self.token_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"refresh_token": token}, file, ensure_ascii=False, indent=1)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.token_path)
 
     def clear_all_tokens(self):
         self.clear_access_token()
@@ -1,12 +1,14 @@
-from PyQt6.QtCore import QObject, QEvent, QUrl, QBuffer, QIODevice, QCoreApplication, QThread, QMetaObject, Qt, \
+from PyQt6.QtCore import QObject, QEvent, QUrl, QIODevice, QCoreApplication, QThread, QMetaObject, Qt, \
     pyqtSignal, pyqtSlot
 from PyQt6.QtMultimedia import QMediaPlayer, QAudioSink, QAudioFormat, QAudio, QAudioOutput, QMediaDevices
 import sounddevice as sd
 import numpy as np
 import logging
-from scipy import signal
 import asyncio
 
+from backend.jitter_buffer import JitterBuffer
+from backend.resampler import StreamingResampler
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -18,11 +20,74 @@ class InitializeAudioEvent(QEvent):
         super().__init__(self.EventType)
 
 
+class PlayoutDevice(QIODevice):
+    """Источник для QAudioSink в pull-режиме.
+
+    Вместо QBuffer, который рос на каждый принятый фрейм, звуковая карта сама
+    забирает ровно столько, сколько может проиграть, из джиттер-буфера. Если
+    данных нет, отдаём тишину — поток не останавливается и задержка не копится.
+    """
+
+    def __init__(self, jitter_buffer, audio_format, parent=None):
+        super().__init__(parent)
+        self.jitter_buffer = jitter_buffer
+        self.channels = audio_format.channelCount()
+        self.sample_format = audio_format.sampleFormat()
+        self.bytes_per_frame = audio_format.bytesPerFrame()
+        self.bytes_per_second = audio_format.bytesForDuration(1_000_000)
+        self._silence_byte = b"\x80" if self.sample_format == QAudioFormat.SampleFormat.UInt8 else b"\x00"
+        # Остаток фрейма, не влезший в прошлый readData
+        self._pending = memoryview(b"")
+
+    def isSequential(self):
+        return True
+
+    def pending_ms(self) -> float:
+        return len(self._pending) * 1000 / self.bytes_per_second if self.bytes_per_second else 0.0
+
+    def _encode(self, chunk: np.ndarray) -> bytes:
+        """float32 [-1, 1] в формат устройства."""
+        if chunk.ndim == 1:
+            chunk = chunk[:, np.newaxis]
+        if chunk.shape[1] != self.channels:
+            chunk = np.repeat(chunk[:, :1], self.channels, axis=1)
+        if self.sample_format == QAudioFormat.SampleFormat.Float:
+            return chunk.astype(np.float32, copy=False).tobytes()
+        chunk = np.clip(chunk, -1.0, 1.0)
+        if self.sample_format == QAudioFormat.SampleFormat.Int16:
+            return (chunk * 32767).astype(np.int16).tobytes()
+        if self.sample_format == QAudioFormat.SampleFormat.Int32:
+            return (chunk * 2147483647).astype(np.int32).tobytes()
+        return (chunk * 127 + 128).astype(np.uint8).tobytes()
+
+    def readData(self, maxlen):
+        maxlen -= maxlen % self.bytes_per_frame
+        parts = []
+        size = 0
+        pending = self._pending
+        while size < maxlen:
+            if not pending:
+                chunk = self.jitter_buffer.pop()
+                if chunk is None:
+                    break
+                pending = memoryview(self._encode(chunk))
+            take = min(len(pending), maxlen - size)
+            parts.append(pending[:take])
+            pending = pending[take:]
+            size += take
+        self._pending = pending
+        if size < maxlen:
+            parts.append(self._silence_byte * (maxlen - size))
+        return b"".join(parts)
+
+    def writeData(self, data):
+        return -1
+
+
 class AudioManager(QObject):
     # Правильное объявление сигналов (на уровне класса)
     play_ringtone_signal = pyqtSignal(str, bool)
     play_notification_signal = pyqtSignal(str)
-    play_audio_chunk_signal = pyqtSignal(np.ndarray)
     init_signal = pyqtSignal()  # Добавлен сигнал для инициализации
 
     def __init__(self, sample_rate=44100, channels=2, parent=None):
@@ -35,21 +100,24 @@ class AudioManager(QObject):
 
         self.sample_rate = sample_rate
         self.output_channels = channels
+        # Частота, на которой реально играет QAudioSink; WebRTC присылает 48 кГц,
+        # и если устройство её принимает, ресэмплинг не нужен вовсе
+        self.output_sample_rate = 48000
         self.input_stream = None
         self.audio_output = None
-        self.audio_buffer = None
+        self.playout_device = None
+        # Принятые фреймы ждут здесь, пока их не заберёт звуковая карта
+        self.jitter_buffer = JitterBuffer()
 
         # Подключаем сигналы (должно быть после super().__init__())
         self.init_signal.connect(self._init_media_players)
         self.play_ringtone_signal.connect(self._play_ringtone)
         self.play_notification_signal.connect(self._play_notification)
-        self.play_audio_chunk_signal.connect(self._play_audio_chunk_handler)
 
         # Запускаем инициализацию через сигнал
         self.init_signal.emit()
 
         self._output_stopped_intentionally = False
-        self._pending_audio_chunks = []
 
     @pyqtSlot()
     def _init_media_players(self):
@@ -97,24 +165,23 @@ class AudioManager(QObject):
         """Потокобезопасная версия"""
         self.play_notification_signal.emit(path)
 
-    def _play_audio_chunk_handler(self, audio_chunk: np.ndarray):
-        """Обработчик аудио-чанков в главном потоке"""
-        try:
-            if not self.audio_output or self.audio_output.state() not in (
-            QAudio.State.ActiveState, QAudio.State.IdleState):
-                self._pending_audio_chunks.append(audio_chunk)
-                QCoreApplication.postEvent(self, InitializeAudioEvent())
-                return
-
-            # Остальная логика обработки аудио...
-            audio_bytes = audio_chunk.tobytes()
-            self.audio_buffer.write(audio_bytes)
-        except Exception as e:
-            logging.error(f"Ошибка воспроизведения: {e}")
-
-    def play_audio_chunk(self, audio_chunk: np.ndarray):
-        """Потокобезопасная версия"""
-        self.play_audio_chunk_signal.emit(audio_chunk.copy())
+    def play_audio_chunk(self, audio_chunk: np.ndarray, timestamp=None, duration=None):
+        """Потокобезопасная версия: фрейм уходит в джиттер-буфер, звуковая карта заберёт сама"""
+        self.jitter_buffer.push(audio_chunk, timestamp, duration)
+        if self.audio_output is None:
+            QCoreApplication.postEvent(self, InitializeAudioEvent())
+
+    def get_playout_stats(self) -> dict:
+        """Счётчики джиттер-буфера и полная задержка воспроизведения в мс."""
+        stats = self.jitter_buffer.stats()
+        device_ms = 0.0
+        if self.playout_device and self.audio_output:
+            queued = self.audio_output.bufferSize() - self.audio_output.bytesFree()
+            device_ms = self.playout_device.pending_ms() + \
+                max(0, queued) * 1000 / self.playout_device.bytes_per_second
+        stats["device_ms"] = device_ms
+        stats["playout_delay_ms"] = stats["buffered_ms"] + device_ms
+        return stats
 
 
     def _initialize_audio_output(self, audio_format=None):
@@ -140,42 +207,33 @@ class AudioManager(QObject):
             formats_to_try[2].setSampleRate(44100)
             formats_to_try[2].setSampleFormat(QAudioFormat.SampleFormat.Int16)
 
+            device = QMediaDevices.defaultAudioOutput()
             for fmt in formats_to_try:
                 logging.info(f"Попытка формата: {fmt.sampleRate()}Hz, {fmt.channelCount()} каналов, {fmt.sampleFormat()}")
-                self.audio_output = QAudioSink(QMediaDevices.defaultAudioOutput(), fmt)
-                if self.audio_output.format().sampleFormat() in (
-                    QAudioFormat.SampleFormat.UInt8,
-                    QAudioFormat.SampleFormat.Int16,
-                    QAudioFormat.SampleFormat.Int32,
-                    QAudioFormat.SampleFormat.Float
-                ):
-                    logging.info(f"Формат принят: {self.audio_output.format().sampleRate()}Hz, {self.audio_output.format().sampleFormat()}")
+                # QAudioSink.format() возвращает запрошенный формат как есть — спрашиваем устройство
+                if device.isFormatSupported(fmt):
+                    self.audio_output = QAudioSink(device, fmt)
+                    logging.info(f"Формат принят: {fmt.sampleRate()}Hz, {fmt.sampleFormat()}")
                     break
             else:
-                self.audio_output = QAudioSink(QMediaDevices.defaultAudioOutput())
-                fmt = self.audio_output.format()
+                fmt = device.preferredFormat()
+                self.audio_output = QAudioSink(device, fmt)
                 logging.info(f"Используется формат устройства: {fmt.sampleRate()}Hz, {fmt.channelCount()} каналов, {fmt.sampleFormat()}")
 
+            self.output_sample_rate = self.audio_output.format().sampleRate()
             self.audio_output.setVolume(1.0)
             self.audio_output.setBufferSize(1024 * 16)
-            self.audio_buffer = QBuffer()
-            self.audio_buffer.open(QIODevice.OpenModeFlag.ReadWrite)
-            self.audio_output.start(self.audio_buffer)
+            self.playout_device = PlayoutDevice(self.jitter_buffer, self.audio_output.format(), self)
+            self.playout_device.open(QIODevice.OpenModeFlag.ReadOnly)
+            self.audio_output.start(self.playout_device)
             logging.info(f"🔊 Аудиовыходной поток запущен: {fmt.sampleRate()}Hz, {fmt.channelCount()} каналов, {fmt.sampleFormat()}")
             self._output_stopped_intentionally = False
-
-            self._process_pending_chunks()
             return True
         except Exception as e:
             logging.error(f"❌ Ошибка при инициализации QAudioSink: {type(e).__name__}: {e}")
             self.stop_output_stream()
             return False
 
-    def _process_pending_chunks(self):
-        while self._pending_audio_chunks:
-            chunk = self._pending_audio_chunks.pop(0)
-            self.play_audio_chunk(chunk)
-
     def start_output_stream(self):
         if self.audio_output and self.audio_output.state() in (QAudio.State.ActiveState, QAudio.State.IdleState):
             logging.info("🔊 Аудиовыход уже запущен")
@@ -187,16 +245,15 @@ class AudioManager(QObject):
         if self.audio_output:
             try:
                 self.audio_output.stop()
-                if self.audio_buffer:
-                    self.audio_buffer.close()
+                if self.playout_device:
+                    self.playout_device.close()
                 logging.info("🔇 Аудиовыходной поток остановлен")
             except Exception as e:
                 logging.error(f"❌ Ошибка при остановке QAudioSink: {type(e).__name__}: {e}")
             finally:
                 self.audio_output = None
-                self.audio_buffer = None
+                self.playout_device = None
                 self._output_stopped_intentionally = True
-                self._pending_audio_chunks.clear()
 
 
     def stop_ringtone(self):
@@ -257,76 +314,103 @@ class AudioManager(QObject):
 
 
 class AudioReceiverTrack:
+    # Усиление принятого звука (осторожно!)
+    GAIN = 2.0
+    # Множитель перевода целых сэмплов в float [-1, 1]
+    SAMPLE_SCALE = {np.int16: 1 / 32768.0, np.int32: 1 / 2147483648.0}
+
     def __init__(self, track, audio_manager):
         self.track = track
         self.audio_manager = audio_manager
         self.running = True
+        # Создаётся под пару частот и число каналов, состояние живёт весь звонок
+        self._resampler = None
+        # Рабочий буфер на сессию: размер фрейма постоянный, выделяется один раз
+        self._samples = None
+        self.frame_count = 0
+        self.empty_frames = 0
 
     async def receive_audio(self):
         print("🔁 Начат приём аудиофреймов через AudioReceiverTrack")
+        # Хвост и счётчики прошлого звонка не нужны
+        self.audio_manager.jitter_buffer.reset()
         self.audio_manager.start_output_stream()
-        frame_count = 0
         while self.running and self.track.readyState == "live":
             try:
                 frame = await asyncio.wait_for(self.track.recv(), timeout=1.0)
-                frame_count += 1
-                print(f"📻 Получен аудиофрейм #{frame_count}, размер: {len(frame.to_ndarray())}")
+                self.frame_count += 1
                 audio_data = self._process_audio_frame(frame)
-                if audio_data is not None and len(audio_data) > 0:
-                    print(f"🔊 Отправлен аудиофрейм на воспроизведение, размер: {len(audio_data)}")
-                    self.audio_manager.play_audio_chunk(audio_data)
+                if audio_data is not None:
+                    # Метка времени фрейма — по ней джиттер-буфер ставит его на место
+                    self.audio_manager.play_audio_chunk(audio_data, frame.time, frame.samples / frame.sample_rate)
                 else:
-                    print("⚠️ Пустой или некорректный аудиофрейм")
+                    self.empty_frames += 1
             except asyncio.TimeoutError:
-                print("⏱️ Таймаут при получении аудиофрейма")
+                logging.debug("⏱️ Таймаут при получении аудиофрейма")
                 continue
             except Exception as e:
                 print(f"❌ Ошибка при обработке аудиофрейма: {e}")
                 break
 
     def _process_audio_frame(self, frame):
-        """Обработка аудиофрейма"""
+        """Обработка аудиофрейма.
+
+        Всё на месте в рабочем буфере: перевод в float с усилением одним
+        умножением, clip, ресэмплинг, раскладка по каналам. Новый массив —
+        только результат, он уходит в джиттер-буфер.
+        """
         try:
-            audio_data = frame.to_ndarray()
-            print(
-                f"📥 Получен аудиофрейм: sample_rate={frame.sample_rate}, channels={frame.channels}, dtype={audio_data.dtype}")
-            if audio_data is None or len(audio_data) == 0:
-                print("⚠️ Пустой аудиофрейм")
+            raw = frame.to_ndarray()
+            if raw is None or raw.size == 0:
                 return None
 
-            # Нормализуем данные
-            if audio_data.dtype == np.int16:
-                audio_data = audio_data.astype(np.float32) / 32768.0
-            elif audio_data.dtype == np.int32:
-                audio_data = audio_data.astype(np.float32) / 2147483648.0
-            elif audio_data.dtype != np.float32:
-                audio_data = audio_data.astype(np.float32)
-
-            # Применяем усиление (осторожно!)
-            audio_data = np.clip(audio_data * 2.0, -1.0, 1.0)
-
-            # Ресэмплинг если необходимо
-            if frame.sample_rate != self.audio_manager.sample_rate:
-                logging.debug(f"🔄 Ресэмплинг: {frame.sample_rate}Hz -> {self.audio_manager.sample_rate}Hz")
-                num_samples = int(len(audio_data) * self.audio_manager.sample_rate / frame.sample_rate)
-                if num_samples > 0:
-                    audio_data = signal.resample(audio_data, num_samples)
-
-            # Обеспечиваем правильное количество каналов
-            if audio_data.ndim == 1:
-                # Моно -> Стерео
-                audio_data = np.repeat(audio_data[:, np.newaxis], self.audio_manager.output_channels, axis=1)
-            elif audio_data.shape[1] == 1 and self.audio_manager.output_channels == 2:
-                # Моно -> Стерео
-                audio_data = np.repeat(audio_data, 2, axis=1)
-            elif audio_data.shape[1] > self.audio_manager.output_channels:
-                # Обрезаем лишние каналы
-                audio_data = audio_data[:, :self.audio_manager.output_channels]
-
-            # Финальная нормализация
-            max_amplitude = np.max(np.abs(audio_data))
-            if max_amplitude > 1.0:
-                audio_data = audio_data / max_amplitude
+            # to_ndarray: planar — [каналы, сэмплы], packed — [1, сэмплы * каналы].
+            # Дальше везде [сэмплы, каналы]; оба варианта — view без копии
+            channels = len(frame.layout.channels)
+            raw = raw.T if frame.format.is_planar else raw.reshape(-1, channels)
+
+            out_rate = self.audio_manager.output_sample_rate
+            output_channels = self.audio_manager.output_channels
+            resample = frame.sample_rate != out_rate
+            # Быстрый путь (48 кГц, каналы совпадают): считаем сразу в результат
+            direct = not resample and channels == output_channels
+            samples = self._samples
+            if direct:
+                samples = np.empty(raw.shape, dtype=np.float32)
+            elif samples is None or samples.shape != raw.shape:
+                samples = self._samples = np.empty(raw.shape, dtype=np.float32)
+            scale = self.SAMPLE_SCALE.get(raw.dtype.type, 1.0) * self.GAIN
+            np.multiply(raw, scale, out=samples, dtype=np.float32, casting="unsafe")
+            # clip через minimum/maximum — заметно дешевле np.clip на коротких массивах
+            np.minimum(samples, 1.0, out=samples)
+            np.maximum(samples, -1.0, out=samples)
+            if direct:
+                return samples
+
+            if resample:
+                resampler = self._resampler
+                if resampler is None or (resampler.in_rate, resampler.out_rate, resampler.channels) != \
+                        (frame.sample_rate, out_rate, channels):
+                    resampler = self._resampler = StreamingResampler(frame.sample_rate, out_rate, channels)
+                samples = resampler.process(samples)
+
+            # Раскладка по каналам выхода: моно копируется в каждый канал, лишние обрезаются
+            audio_data = np.empty((len(samples), output_channels), dtype=np.float32)
+            if channels == 1:
+                # Поколоночно: broadcast [n, 1] -> [n, 2] в numpy втрое медленнее
+                for channel in range(output_channels):
+                    audio_data[:, channel] = samples[:, 0]
+            elif channels >= output_channels:
+                audio_data[:] = samples[:, :output_channels]
+            else:
+                audio_data[:, :channels] = samples
+                audio_data[:, channels:] = 0
+
+            # После clip выйти за 1.0 может только фильтр ресэмплера
+            if resample:
+                peak = max(audio_data.max(), -audio_data.min())
+                if peak > 1.0:
+                    audio_data *= 1.0 / peak
 
             return audio_data
 
@@ -0,0 +1,157 @@
+import math
+import threading
+import time
+
+import numpy as np
+
+
+class JitterBuffer:
+    """Адаптивный джиттер-буфер принятых аудиофреймов.
+
+    Фреймы раскладываются по номеру из метки времени (pts), поэтому
+    переставленные пакеты встают на место, опоздавшие (уже проигранные)
+    выбрасываются, а пропуски заполняются повтором последнего фрейма с
+    затуханием. Целевая задержка подстраивается под оценку джиттера прихода
+    (как в RFC 3550): при стабильной сети буфер сжимается, при рваной — растёт.
+
+    Писатель — receive_audio, читатель — PlayoutDevice.readData, поэтому
+    состояние защищено блокировкой.
+    """
+
+    MIN_DELAY_MS = 40
+    MAX_DELAY_MS = 300
+    # Сколько пропусков подряд маскируем повтором, дальше — тишина
+    MAX_CONCEALED = 3
+    CONCEAL_FADE = 0.5
+
+    def __init__(self, min_delay_ms=MIN_DELAY_MS, max_delay_ms=MAX_DELAY_MS):
+        self.min_delay_ms = min_delay_ms
+        self.max_delay_ms = max_delay_ms
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._frames: dict[int, np.ndarray] = {}
+            self._next_index = None
+            self._last_index = None
+            self._frame_ms = 20.0
+            self._buffering = True
+            self._last_chunk = None
+            self._concealed_run = 0
+            self._last_arrival = None
+            self._last_media_time = None
+            self.jitter_ms = 0.0
+            # Счётчики
+            self.received = 0
+            self.late = 0
+            self.concealed = 0
+            self.underruns = 0
+            self.dropped = 0
+
+    # ================= Писатель =================
+    def push(self, chunk: np.ndarray, timestamp=None, duration=None):
+        """Положить обработанный фрейм. timestamp и duration — в секундах."""
+        arrival = time.monotonic()
+        with self._lock:
+            if duration:
+                self._frame_ms = duration * 1000
+            if timestamp is None or not duration:
+                index = self._last_index + 1 if self._last_index is not None else 0
+            else:
+                index = round(timestamp / duration)
+                self._update_jitter(arrival, timestamp)
+
+            self.received += 1
+            max_frames = max(1, int(self.max_delay_ms / self._frame_ms))
+            if self._next_index is not None and abs(index - self._next_index) > 4 * max_frames:
+                # Разрыв во времени (новый поток, перезапуск ICE) — начинаем шкалу заново
+                self._frames.clear()
+                self._next_index = None
+                self._last_index = None
+                self._buffering = True
+            if self._next_index is not None and index < self._next_index:
+                # Место фрейма уже проиграно (или замаскировано)
+                self.late += 1
+                return
+            self._frames[index] = chunk
+            if self._last_index is None or index > self._last_index:
+                self._last_index = index
+            if self._next_index is None:
+                self._next_index = index
+
+            # Память ограничена: больше max_delay_ms не держим
+            while self._last_index - self._next_index + 1 > max_frames:
+                self._drop_next()
+
+    def _update_jitter(self, arrival, media_time):
+        if self._last_arrival is not None:
+            transit_delta = (arrival - self._last_arrival) - (media_time - self._last_media_time)
+            self.jitter_ms += (abs(transit_delta) * 1000 - self.jitter_ms) / 16
+        self._last_arrival = arrival
+        self._last_media_time = media_time
+
+    def _drop_next(self):
+        if self._frames.pop(self._next_index, None) is not None:
+            self.dropped += 1
+        self._next_index += 1
+
+    def _depth_frames(self):
+        if self._next_index is None or self._last_index is None:
+            return 0
+        return max(0, self._last_index - self._next_index + 1)
+
+    def target_delay_ms(self):
+        target = self._frame_ms + 4 * self.jitter_ms
+        return min(self.max_delay_ms, max(self.min_delay_ms, target))
+
+    # ================= Читатель =================
+    def pop(self):
+        """Следующий фрейм для воспроизведения или None (играть тишину)."""
+        with self._lock:
+            target_frames = math.ceil(self.target_delay_ms() / self._frame_ms)
+            if self._buffering:
+                if not self._frames or self._depth_frames() < target_frames:
+                    return None
+                # Набрали целевую задержку — начинаем с самого раннего фрейма
+                self._buffering = False
+                self._next_index = min(self._frames)
+
+            if not self._frames:
+                # Данные кончились: копим заново, чтобы не трещать по фрейму
+                self.underruns += 1
+                self._buffering = True
+                self._last_chunk = None
+                return None
+
+            # Задержка выросла выше цели — выбрасываем фрейм, догоняя сеть
+            if self._depth_frames() > target_frames + 2:
+                self._drop_next()
+
+            chunk = self._frames.pop(self._next_index, None)
+            self._next_index += 1
+            if chunk is not None:
+                self._last_chunk = chunk
+                self._concealed_run = 0
+                return chunk
+
+            # Фрейм потерян или ещё в пути, а следующие уже есть — маскируем
+            self.concealed += 1
+            self._concealed_run += 1
+            if self._last_chunk is None or self._concealed_run > self.MAX_CONCEALED:
+                return None
+            self._last_chunk = self._last_chunk * self.CONCEAL_FADE
+            return self._last_chunk
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "buffered_ms": self._depth_frames() * self._frame_ms,
+                "target_ms": self.target_delay_ms(),
+                "jitter_ms": self.jitter_ms,
+                "received": self.received,
+                "late": self.late,
+                "concealed": self.concealed,
+                "underruns": self.underruns,
+                "dropped": self.dropped,
+            }
@@ -1,26 +1,41 @@
 import sounddevice as sd
 from aiortc import MediaStreamTrack
+from aiortc.mediastreams import MediaStreamError
 import time
 import fractions
 import numpy as np
 import asyncio
 import logging
-import threading
 from av import AudioFrame
 
+from backend.ring_buffer import RingBuffer
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 
 class AudioStreamTrack(MediaStreamTrack):
     """Трек для отправки аудио с микрофона"""
     kind = "audio"
+    # Нехватка данных — если блок микрофона не пришёл за столько фреймов ожидания,
+    # то есть пропущен целый срок блока. Обычное ожидание следующего блока
+    # (до одного фрейма) underrun не считается
+    UNDERRUN_AFTER_FRAMES = 2
 
-    def __init__(self, sample_rate=48000, channels=1, frame_size=960):
+    def __init__(self, sample_rate=48000, channels=1, frame_size=960, max_latency_ms=200):
         super().__init__()
         self.sample_rate = sample_rate
         self.channels = channels
         self.frame_size = frame_size  # Размер фрейма в сэмплах
 
+        # Кольцевой буфер вместо растущего массива: больше max_latency_ms не копим,
+        # старое выбрасываем. Создаётся до запуска микрофона — callback пишет сразу
+        max_latency = max(int(sample_rate * channels * max_latency_ms / 1000), frame_size * channels)
+        self._ring = RingBuffer(max_latency + 4 * frame_size * channels, np.float32, max_latency)
+        self._frame_buffer = np.zeros(frame_size * channels, dtype=np.float32)
+        # recv ждёт future, callback будит его через call_soon_threadsafe
+        self._loop = None
+        self._waiter = None
+
         # Временные метки
         self._start = time.time()
         self._pts = 0
@@ -30,10 +45,6 @@ class AudioStreamTrack(MediaStreamTrack):
         self.stream = None
         self._init_microphone()
 
-        # Буфер для накопления аудиоданных (используем threading.Lock вместо asyncio.Lock)
-        self._buffer = np.array([], dtype=np.float32)
-        self._buffer_lock = threading.Lock()
-
     def _init_microphone(self):
         """Инициализация микрофона"""
         try:
@@ -86,33 +97,65 @@ class AudioStreamTrack(MediaStreamTrack):
             logging.warning(f"⚠️ Статус аудио: {status}")
 
         try:
-            # Конвертируем в одномерный массив
-            audio_data = indata.flatten().copy()
+            # ravel без копии для непрерывного indata, копирование — в кольцо
+            self._ring.write(indata.ravel())
 
-            # Добавляем в буфер синхронно (используем threading.Lock)
-            self._add_to_buffer_sync(audio_data)
+            # Будим recv только когда набрался целый фрейм — одно пробуждение на фрейм
+            waiter = self._waiter
+            if waiter is not None and self._ring.available() >= len(self._frame_buffer):
+                self._waiter = None
+                self._loop.call_soon_threadsafe(self._wake, waiter)
 
         except Exception as e:
             logging.error(f"❌ Ошибка в audio_callback: {e}")
 
-    def _add_to_buffer_sync(self, audio_data):
-        """Синхронное добавление данных в буфер"""
-        with self._buffer_lock:
-            self._buffer = np.concatenate([self._buffer, audio_data])
+    @staticmethod
+    def _wake(waiter, result=True):
+        if not waiter.done():
+            waiter.set_result(result)
+
+    async def _wait_frame(self, timeout=None) -> bool:
+        """Ждать, пока callback не допишет целый фрейм. False — истёк timeout."""
+        self._loop = asyncio.get_running_loop()
+        waiter = self._loop.create_future()
+        self._waiter = waiter
+        # Данные могли прийти до публикации waiter — тогда callback его не увидел
+        if self._ring.available() >= len(self._frame_buffer):
+            self._waiter = None
+            return True
+        # Таймер будит тот же future, без обёрток asyncio.wait
+        timer = self._loop.call_later(timeout, self._wake, waiter, False) if timeout is not None else None
+        try:
+            return await waiter
+        finally:
+            self._waiter = None
+            if timer is not None:
+                timer.cancel()
+
+    def get_stats(self):
+        """Счётчики буфера захвата и текущая задержка в мс."""
+        stats = self._ring.stats()
+        stats["buffered_ms"] = stats["buffered"] * 1000 / (self.sample_rate * self.channels)
+        return stats
 
     async def recv(self):
         """Получение следующего аудиофрейма"""
+        if self.readyState != "live":
+            # Трек остановлен — MediaStreamError завершает цикл отправителя aiortc
+            raise MediaStreamError
         try:
             # Ждем накопления достаточного количества данных
-            while True:
-                with self._buffer_lock:
-                    if len(self._buffer) >= self.frame_size:
-                        # Извлекаем фрейм из буфера
-                        frame_data = self._buffer[:self.frame_size].copy()
-                        self._buffer = self._buffer[self.frame_size:]
-                        break
-
-                await asyncio.sleep(0.001)  # Маленькая пауза
+            frame_data = self._frame_buffer
+            starved = False
+            while not self._ring.read_into(frame_data):
+                if self.stream is None or self.readyState != "live":
+                    # Микрофон остановлен — данных больше не будет
+                    raise MediaStreamError
+                timeout = None if starved else self.UNDERRUN_AFTER_FRAMES * self.frame_size / self.sample_rate
+                if not await self._wait_frame(timeout):
+                    # Блок не пришёл к сроку — захват действительно не успевает
+                    starved = True
+                    self._ring.underruns += 1
 
             # Применяем простое шумоподавление
             frame_data = self._apply_noise_gate(frame_data)
@@ -135,6 +178,8 @@ class AudioStreamTrack(MediaStreamTrack):
 
             return frame
 
+        except MediaStreamError:
+            raise
         except Exception as e:
             logging.error(f"❌ Ошибка в recv(): {e}")
             # Возвращаем тишину в случае ошибки
@@ -180,4 +225,10 @@ class AudioStreamTrack(MediaStreamTrack):
             except Exception as e:
                 print(f"❌ Ошибка при остановке микрофона: {e}")
             finally:
-                self.stream = None
\ No newline at end of file
+                self.stream = None
+        # readyState -> "ended": отправитель aiortc перестаёт вызывать recv
+        super().stop()
+        # recv, ждущий фрейм, уже не дождётся — отпускаем его
+        waiter = self._waiter
+        if waiter is not None and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake, waiter)
\ No newline at end of file
@@ -0,0 +1,72 @@
+from functools import lru_cache
+from math import gcd
+
+import numpy as np
+from scipy import signal
+
+
+@lru_cache(maxsize=8)
+def polyphase_taps(up: int, down: int) -> np.ndarray:
+    """Фильтр полифазного ресэмплинга — тот же, что строит signal.resample_poly.
+
+    Считается один раз на пару частот.
+    """
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    taps = signal.firwin(2 * half_len + 1, 1.0 / max_rate, window=("kaiser", 5.0)) * up
+    return taps.astype(np.float32)
+
+
+@lru_cache(maxsize=64)
+def _shifted_taps(up: int, down: int, shift: int) -> np.ndarray:
+    # Задержка фильтра на shift точек сетки up — чтобы выход upfirdn попал
+    # ровно на нужные моменты, когда позиция в потоке не кратна down
+    taps = polyphase_taps(up, down)
+    return np.concatenate((np.zeros(shift, dtype=taps.dtype), taps))
+
+
+class StreamingResampler:
+    """Полифазный ресэмплер потока фреймов.
+
+    В отличие от signal.resample на каждом фрейме по отдельности, хвост входа
+    и дробная позиция переносятся между вызовами: на стыках фреймов нет
+    щелчков, а результат совпадает с resample_poly по всему потоку целиком.
+    """
+
+    def __init__(self, in_rate: int, out_rate: int, channels: int = 1):
+        divisor = gcd(in_rate, out_rate)
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.channels = channels
+        self.up = out_rate // divisor
+        self.down = in_rate // divisor
+        # Фильтру нужны предыдущие len(taps) / up входных сэмплов
+        history = -(-len(polyphase_taps(self.up, self.down)) // self.up)
+        self._history = np.zeros((history, channels), dtype=np.float32)
+        # Склейка history + фрейм, переиспользуется пока размер фрейма не меняется
+        self._buffer = None
+        # Время следующей выходной точки в единицах 1/up входного сэмпла,
+        # от начала склейки history + фрейм
+        self._time = history * self.up
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        """samples: [сэмплы, каналы] float32 -> то же на выходной частоте."""
+        size = len(self._history) + len(samples)
+        buffer = self._buffer
+        if buffer is None or len(buffer) != size:
+            buffer = self._buffer = np.empty((size, self.channels), dtype=np.float32)
+        buffer[:len(self._history)] = self._history
+        buffer[len(self._history):] = samples
+        end = len(buffer) * self.up
+        count = max(0, -(-(end - self._time) // self.down))
+        shift = -self._time % self.down
+        first = (self._time + shift) // self.down
+        out = signal.upfirdn(_shifted_taps(self.up, self.down, shift), buffer, self.up, self.down, axis=0)
+
+        self._history[:] = buffer[size - len(self._history):]
+        self._time += count * self.down - len(samples) * self.up
+        return out[first:first + count]
+
+    def reset(self):
+        self._history[:] = 0
+        self._time = len(self._history) * self.up
@@ -0,0 +1,83 @@
+import numpy as np
+
+
+class RingBuffer:
+    """Кольцевой буфер сэмплов на один поток-писатель и один поток-читатель.
+
+    Массив выделяется один раз. Писатель двигает только _write_pos и свои
+    счётчики, читатель — только _read_pos и свои, поэтому блокировка не нужна:
+    присваивание int под GIL атомарно, а данные копируются в массив до сдвига
+    позиции. stats() складывает счётчики обеих сторон.
+
+    max_latency ограничивает задержку: если накопилось больше, читатель
+    выбрасывает самые старые сэмплы. Если буфер заполнен целиком (читатель
+    стоит), писатель отбрасывает новые данные.
+    """
+
+    def __init__(self, capacity: int, dtype=np.float32, max_latency: int | None = None):
+        self.capacity = capacity
+        self.max_latency = min(max_latency or capacity, capacity)
+        self._data = np.zeros(capacity, dtype=dtype)
+        self._write_pos = 0
+        self._read_pos = 0
+        # Счётчики писателя: переполнения и отброшенные из-за них сэмплы
+        self.overruns = 0
+        self.dropped_samples = 0
+        # Счётчики читателя: нехватка данных и сброс старого сверх max_latency
+        self.underruns = 0
+        self.latency_drops = 0
+        self.latency_dropped_samples = 0
+
+    def available(self) -> int:
+        return self._write_pos - self._read_pos
+
+    # ================= Писатель =================
+    def write(self, samples: np.ndarray) -> int:
+        free = self.capacity - self.available()
+        count = len(samples)
+        if count > free:
+            self.overruns += 1
+            self.dropped_samples += count - free
+            count = free
+        if count <= 0:
+            return 0
+        start = self._write_pos % self.capacity
+        first = min(count, self.capacity - start)
+        self._data[start:start + first] = samples[:first]
+        if count > first:
+            self._data[:count - first] = samples[first:count]
+        self._write_pos += count
+        return count
+
+    # ================= Читатель =================
+    def read_into(self, out: np.ndarray) -> bool:
+        """Заполнить out целиком. False (и out не тронут), если данных мало."""
+        available = self.available()
+        if available > self.max_latency:
+            # Отстали от реального времени — догоняем, выбрасывая старое
+            excess = available - self.max_latency
+            self.latency_drops += 1
+            self.latency_dropped_samples += excess
+            self._read_pos += excess
+        count = len(out)
+        if self.available() < count:
+            return False
+        start = self._read_pos % self.capacity
+        first = min(count, self.capacity - start)
+        out[:first] = self._data[start:start + first]
+        if count > first:
+            out[first:] = self._data[:count - first]
+        self._read_pos += count
+        return True
+
+    def clear(self):
+        self._read_pos = self._write_pos
+
+    def stats(self) -> dict:
+        return {
+            "buffered": self.available(),
+            "overruns": self.overruns + self.latency_drops,
+            "underruns": self.underruns,
+            "dropped_samples": self.dropped_samples + self.latency_dropped_samples,
+            "latency_drops": self.latency_drops,
+        }
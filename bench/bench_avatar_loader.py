@@ -0,0 +1,72 @@
+"""Сколько GUI-поток блокируется на подготовке круглых аватаров.
+
+Синхронный create_circular_pixmap против AvatarLoader (QThreadPool). Для
+загрузчика в GUI-поток засчитывается и постановка в очередь, и обработка
+готовых картинок в _on_finished: QImage -> QPixmap, QPixmapCache, setPixmap.
+Запуск из корня проекта: python bench/bench_avatar_loader.py [число аватаров]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtGui import QPixmap, QPixmapCache  # noqa: E402
+from PyQt6.QtWidgets import QApplication, QLabel  # noqa: E402
+
+SIZE = 45
+
+
+def main(count):
+    app = QApplication([])
+    from screens.utils.avatar_loader import AvatarLoader
+    from screens.utils.circular_photo import create_circular_pixmap
+
+    class TimedLoader(AvatarLoader):
+        finished_ms = 0.0
+
+        def _on_finished(self, key, image):
+            started = time.perf_counter()
+            super()._on_finished(key, image)
+            self.finished_ms += (time.perf_counter() - started) * 1000
+
+    sources = [os.path.join(ROOT, "avatar", f"{i}.jpg") for i in range(1, 10)]
+    with tempfile.TemporaryDirectory() as tmp:
+        # Разные пути — разные ключи кэша, как у разных собеседников
+        paths = []
+        for i in range(count):
+            path = os.path.join(tmp, f"{i}.jpg")
+            shutil.copy(sources[i % len(sources)], path)
+            paths.append(path)
+        labels = [QLabel() for _ in paths]
+
+        started = time.perf_counter()
+        for label, path in zip(labels, paths):
+            label.setPixmap(create_circular_pixmap(QPixmap(path), SIZE))
+        sync_ms = (time.perf_counter() - started) * 1000
+
+        QPixmapCache.clear()
+        labels = [QLabel() for _ in paths]
+        loader = TimedLoader()
+        started = time.perf_counter()
+        for label, path in zip(labels, paths):
+            loader.set_label_avatar(label, path, SIZE)
+        enqueue_ms = (time.perf_counter() - started) * 1000
+        while loader._waiters:
+            loader.wait_for_done(10)
+            app.processEvents()
+        total_ms = (time.perf_counter() - started) * 1000
+        gui_ms = enqueue_ms + loader.finished_ms
+
+    print(f"{count} аватаров по {SIZE}px")
+    print(f"  синхронно в GUI-потоке: {sync_ms:.1f} ms (GUI заблокирован всё это время)")
+    print(f"  AvatarLoader: GUI-поток занят {gui_ms:.1f} ms (очередь {enqueue_ms:.1f} ms + "
+          f"_on_finished {loader.finished_ms:.1f} ms), все готовы через {total_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,66 @@
+"""Время от прихода страницы истории до готовой раскладки чата.
+
+Запуск из корня проекта: python bench/bench_chat_history.py [размеры страниц...]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import qasync  # noqa: E402
+from PyQt6.QtWidgets import QApplication  # noqa: E402
+
+
+def make_messages(count):
+    # Как в ответе сервера: новые сверху
+    return [{
+        "_id": i,
+        "sender_id": i // 3 % 2 + 1,
+        "content": f"сообщение {i} " * 5,
+        "timestamp": f"2025-01-01T10:{i // 60 % 60:02d}:{i % 60:02d}",
+        "read": True,
+        "edited": False,
+    } for i in range(count)][::-1]
+
+
+async def run(app, count):
+    from screens.main_screen.chat_widget import ChatWidget
+
+    widget = ChatWidget(1, "bench", 2, "bench", lambda data: None, lambda text: None, page_size=count)
+    widget.resize(600, 500)
+    widget.show()
+    messages = make_messages(count)
+
+    started = time.perf_counter()
+    await widget.show_history(messages, has_more=False)
+    app.processEvents()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"{count:>6} сообщений: {elapsed_ms:.0f} ms, строк в модели {widget.messages_model.rowCount()}")
+    widget.unsubscribe()
+    widget.close()
+    widget.deleteLater()
+
+
+def main(sizes):
+    app = QApplication([])
+    loop = qasync.QEventLoop(app)
+    asyncio.set_event_loop(loop)
+    from api.local_store import local_store
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Не трогаем настоящую локальную базу пользователя
+        local_store.db_path = os.path.join(tmp, "bench.sqlite3")
+        try:
+            for count in sizes:
+                loop.run_until_complete(run(app, count))
+        finally:
+            local_store.close()
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 10000])
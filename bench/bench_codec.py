@@ -0,0 +1,54 @@
+"""Разбор и кодирование WebSocket-кадров: стандартный json против api.codec.
+
+Кадры берутся из логов клиента (строки «Получено WebSocket-сообщение»).
+Запуск из корня проекта: python bench/bench_codec.py [лог]
+"""
+import json
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from api import codec  # noqa: E402
+
+MARKER = "Получено WebSocket-сообщение: "
+NUMBER = 20000
+
+
+def load_frames(path):
+    frames = []
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            _, found, frame = line.partition(MARKER)
+            if found and frame.strip().startswith("{"):
+                frames.append(frame.strip())
+    return frames
+
+
+def per_frame_us(func, frames):
+    seconds = timeit.timeit(lambda: [func(frame) for frame in frames], number=NUMBER)
+    return seconds / NUMBER / len(frames) * 1e6
+
+
+def main(path):
+    frames = load_frames(path)
+    if not frames:
+        print(f"В {path} нет кадров")
+        return
+    sizes = ", ".join(f"{len(frame.encode())} B" for frame in frames)
+    print(f"{len(frames)} кадров ({sizes}), backend: {codec.BACKEND}")
+
+    # До общего кодека кадр разбирался дважды: в WebSocketClient и в MainWindow
+    double = per_frame_us(lambda frame: (json.loads(frame), json.loads(frame)), frames)
+    single = per_frame_us(json.loads, frames)
+    fast = per_frame_us(codec.loads, frames)
+    print(f"  разбор: json дважды {double:.1f} us, json {single:.1f} us, codec {fast:.1f} us")
+
+    objects = [json.loads(frame) for frame in frames]
+    print(f"  кодирование: json {per_frame_us(json.dumps, objects):.1f} us, codec {per_frame_us(codec.dumps, objects):.1f} us")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else os.path.join(ROOT, "logs", "client1.txt"))
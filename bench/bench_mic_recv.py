@@ -0,0 +1,91 @@
+"""Пробуждения цикла событий и CPU на секунду звонка в AudioStreamTrack.recv.
+
+Поток-«микрофон» раз в 20 мс отдаёт блок в _audio_callback, recv забирает
+фреймы. Сравнивается ожидание через future (call_soon_threadsafe) с прежним
+опросом через asyncio.sleep(0.001).
+Запуск из корня проекта: python bench/bench_mic_recv.py [секунды]
+"""
+import asyncio
+import asyncio.base_events
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from backend.microphone_stream import AudioStreamTrack  # noqa: E402
+
+FRAME_SIZE = 960
+BLOCK_SECONDS = FRAME_SIZE / 48000
+
+
+class BenchTrack(AudioStreamTrack):
+    def _init_microphone(self):
+        # Без звуковой карты: блоки подаёт поток бенчмарка
+        self.stream = True
+
+
+class PollingTrack(BenchTrack):
+    async def _wait_frame(self, timeout=None):
+        # Как было до user-022
+        await asyncio.sleep(0.001)
+        return True
+
+
+iterations = 0
+_run_once = asyncio.base_events.BaseEventLoop._run_once
+
+
+def _counting_run_once(loop):
+    global iterations
+    iterations += 1
+    _run_once(loop)
+
+
+asyncio.base_events.BaseEventLoop._run_once = _counting_run_once
+
+
+def capture(track, stop):
+    block = (np.random.default_rng(0).random((FRAME_SIZE, 1), dtype=np.float32) - 0.5) * 0.5
+    deadline = time.perf_counter()
+    while not stop.is_set():
+        deadline += BLOCK_SECONDS
+        time.sleep(max(0.0, deadline - time.perf_counter()))
+        track._audio_callback(block, FRAME_SIZE, None, None)
+
+
+async def run(track_class, label, seconds):
+    global iterations
+    track = track_class(frame_size=FRAME_SIZE)
+    stop = threading.Event()
+    thread = threading.Thread(target=capture, args=(track, stop))
+    thread.start()
+    try:
+        iterations = 0
+        cpu_started = time.process_time()
+        frames = 0
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            await track.recv()
+            frames += 1
+        cpu = time.process_time() - cpu_started
+        wakeups = iterations
+    finally:
+        stop.set()
+        thread.join()
+    print(f"  {label}: {wakeups / seconds:.0f} итераций цикла/с "
+          f"({wakeups / frames:.1f} на фрейм), CPU {cpu / seconds * 100:.2f}%")
+
+
+def main(seconds):
+    print(f"{seconds:.0f} с захвата блоками по {BLOCK_SECONDS * 1000:.0f} мс")
+    asyncio.run(run(PollingTrack, "опрос sleep(0.001)", seconds))
+    asyncio.run(run(BenchTrack, "future из callback", seconds))
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 5.0)
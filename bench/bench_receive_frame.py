@@ -0,0 +1,85 @@
+"""ns на фрейм в AudioReceiverTrack._process_audio_frame.
+
+Сравнивается с прежней цепочкой (новый массив на каждом шаге), повторённой
+здесь без print. Фрейм — 20 мс packed s16, как отдаёт декодер Opus в aiortc.
+Запуск из корня проекта: python bench/bench_receive_frame.py [число фреймов]
+"""
+import os
+import sys
+import time
+import types
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from backend.audio_manager import AudioReceiverTrack  # noqa: E402
+from backend.resampler import StreamingResampler  # noqa: E402
+
+FRAME_SIZE = 960
+
+
+class BenchFrame:
+    """То, что _process_audio_frame читает у av.AudioFrame."""
+
+    def __init__(self, channels, sample_rate=48000):
+        samples = (np.sin(np.arange(FRAME_SIZE * channels) / 10) * 20000).astype(np.int16)
+        self._data = samples[np.newaxis, :]
+        self.layout = types.SimpleNamespace(channels=[None] * channels)
+        self.format = types.SimpleNamespace(is_planar=False)
+        self.sample_rate = sample_rate
+        self.samples = FRAME_SIZE
+
+    def to_ndarray(self):
+        return self._data
+
+
+class ReferenceProcessor:
+    """Цепочка до user-025: astype, деление, clip(x * 2), resample, repeat, нормализация."""
+
+    def __init__(self, audio_manager):
+        self.audio_manager = audio_manager
+        self._resampler = None
+
+    def _process_audio_frame(self, frame):
+        channels = len(frame.layout.channels)
+        audio_data = frame.to_ndarray().reshape(-1, channels)
+        audio_data = audio_data.astype(np.float32) / 32768.0
+        audio_data = np.clip(audio_data * 2.0, -1.0, 1.0)
+        out_rate = self.audio_manager.output_sample_rate
+        if frame.sample_rate != out_rate:
+            if self._resampler is None:
+                self._resampler = StreamingResampler(frame.sample_rate, out_rate, channels)
+            audio_data = self._resampler.process(audio_data)
+        if audio_data.shape[1] == 1 and self.audio_manager.output_channels == 2:
+            audio_data = np.repeat(audio_data, 2, axis=1)
+        elif audio_data.shape[1] > self.audio_manager.output_channels:
+            audio_data = audio_data[:, :self.audio_manager.output_channels]
+        max_amplitude = np.max(np.abs(audio_data))
+        if max_amplitude > 1.0:
+            audio_data = audio_data / max_amplitude
+        return audio_data
+
+
+def ns_per_frame(processor, frame, count):
+    for _ in range(10):
+        processor._process_audio_frame(frame)
+    started = time.perf_counter_ns()
+    for _ in range(count):
+        processor._process_audio_frame(frame)
+    return (time.perf_counter_ns() - started) / count
+
+
+def main(count):
+    for channels in (2, 1):
+        frame = BenchFrame(channels)
+        for out_rate in (48000, 44100):
+            audio_manager = types.SimpleNamespace(output_sample_rate=out_rate, output_channels=2)
+            before = ns_per_frame(ReferenceProcessor(audio_manager), frame, count)
+            after = ns_per_frame(AudioReceiverTrack(None, audio_manager), frame, count)
+            print(f"каналов {channels}, выход {out_rate} Гц: {before:.0f} -> {after:.0f} ns/frame")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -7,6 +7,9 @@ from backend.audio_manager import AudioManager
 from screens.main_screen.main_screen import MainWindow
 from screens.login_screen.login_screen import LoginWindow
 from api.auth import check_refresh_token_expired
+from api.avatar_cache import avatar_cache
+from api.common import close_client
+from api.local_store import local_store
 from backend.check_for_token import check_for_token_existing
 import logging
 
@@ -30,17 +33,32 @@ async def async_main():
         # Проверка токена
         token_exist = check_for_token_existing()
 
-        if token_exist == 1:
+        if token_exist == 1 and local_store.has_snapshot():
+            # Тёплый старт: окно сразу из локальной копии, токен проверяем в фоне
+            window = MainWindow(audio, connect=False)
+            window.show()
+            logger.info("Main window shown from local snapshot")
             refresh_result = await check_refresh_token_expired()
-            if "request error" in refresh_result:
-                window = LoginWindow("Ошибка с токеном, войдите заново", audio=audio)
+            if "request error" in refresh_result and not refresh_result.get("offline"):
+                login_window = LoginWindow("Ошибка с токеном, войдите заново", audio=audio)
+                login_window.show()
+                window.discard()
+                window = login_window
             else:
-                window = MainWindow(audio)
+                # Без сети тоже подключаемся: клиент сам переподключится и обновит токен
+                window.start_connection()
         else:
-            window = LoginWindow(audio=audio)
+            if token_exist == 1:
+                refresh_result = await check_refresh_token_expired()
+                if "request error" in refresh_result:
+                    window = LoginWindow("Ошибка с токеном, войдите заново", audio=audio)
+                else:
+                    window = MainWindow(audio)
+            else:
+                window = LoginWindow(audio=audio)
 
-        window.show()
-        logger.info("Main window shown")
+            window.show()
+            logger.info("Main window shown")
 
         # Ждем закрытия окна
         while getattr(window, 'isVisible', lambda: True)():
@@ -69,7 +87,12 @@ def main():
 
         # Запуск основного цикла
         with loop:
-            sys.exit(loop.run_forever())
+            exit_code = loop.run_forever()
+            # Закрываем пул HTTP-соединений до остановки цикла
+            loop.run_until_complete(close_client())
+            avatar_cache.flush()
+            local_store.close()
+        sys.exit(exit_code)
 
     except Exception as e:
         logger.error(f"Fatal error in main: {e}", exc_info=True)
@@ -1,17 +1,18 @@
 import asyncio
 
 from PyQt6.QtCore import Qt, QSize
-from PyQt6.QtGui import QPixmap, QFont, QIcon, QCursor
+from PyQt6.QtGui import QFont, QIcon, QCursor
 from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton
 from aiortc import RTCPeerConnection
 from more_itertools.recipes import unique
 
-from backend.avatar_path_getter import find_image_path_by_number
+from api.profile_actions import get_avatar_path
+from api.profile_cache import profile_cache
 from backend.call_session import CallSession
 
 from screens.utils.animate_button import StyledAnimatedButton
 from screens.utils.animate_text_button import AnimatedButton
-from screens.utils.circular_photo import create_circular_pixmap
+from screens.utils.circular_photo import circular_avatar
 from screens.utils.default_avatar import default_ava_path
 from screens.utils.screen_style_sheet import load_custom_font
 from screens.utils.search_screen_profile_widget import SearchScreenProfileWidget
@@ -106,11 +107,18 @@ class CallWidget(QWidget):
 
     def fill_data(self):
         self.set_avatar(self.receiver_avatar_path)
-        self.nickname.setText(self.receiver_name)
+        self.nickname.setText(self.get_receiver_name())
+
+    def get_receiver_name(self):
+        # Для личного звонка берём актуальный ник из общего кэша профилей
+        if not self.is_group and not isinstance(self.receiver_id, list):
+            nickname = profile_cache.get_nickname(self.receiver_id)
+            if nickname:
+                return nickname
+        return self.receiver_name
 
     def set_avatar(self, receiver_avatar_path):
-        pixmap = QPixmap(receiver_avatar_path if receiver_avatar_path else default_ava_path)
-        circular_pixmap = create_circular_pixmap(pixmap, 120)
+        circular_pixmap = circular_avatar(receiver_avatar_path if receiver_avatar_path else default_ava_path, 120)
         self.avatar.setPixmap(circular_pixmap)
 
     async def send_ice_callback(self, data: dict):
@@ -167,11 +175,11 @@ class CallWidget(QWidget):
             await self.call_session.add_ice_candidate(candidate)
 
     def set_cur_user_info(self):
-        data = {"nickname": self.cur_user_info["nickname"], "avatar_path": find_image_path_by_number("avatar", 1)}
+        data = {"nickname": self.cur_user_info["nickname"], "avatar_path": get_avatar_path(self.cur_user_info.get("id"))}
         self.cur_user.sync_input_data(data)
 
     def set_receiver_info(self):
-        data = {"nickname": self.receiver_name, "avatar_path": self.receiver_avatar_path}
+        data = {"nickname": self.get_receiver_name(), "avatar_path": self.receiver_avatar_path}
         self.receiver.sync_input_data(data)
 
     def toggle_call_state(self):
@@ -1,35 +1,45 @@
-import asyncio
 from datetime import datetime, UTC
 
-from PyQt6.QtGui import QPixmap, QFont, QIcon, QCursor, QPalette, QColor
+from PyQt6.QtGui import QFont, QIcon, QCursor, QPalette, QColor
 from alembic.command import history
 
-from api.profile_actions import get_avatar_path, get_user_info
-from screens.utils.circular_photo import create_circular_pixmap
+from api.profile_actions import get_avatar_path, load_user_info, profile_loader
+from api.local_store import local_store
+from api.profile_cache import profile_cache
+from screens.utils.circular_photo import circular_avatar
 from screens.utils.default_avatar import default_ava_path
 from screens.utils.enter_text_edit import EnterTextEdit
-from screens.utils.message_widget import MessageWidget
+from screens.utils.message_view import MessageListModel, MessageListView
+from screens.main_screen.ws_dispatcher import ws_dispatcher
 from PyQt6.QtCore import pyqtSlot, Qt, QTime, QTimer, QSize
-from PyQt6.QtWidgets import QWidget, QTextEdit, QLineEdit, QPushButton, QVBoxLayout, QLabel, QScrollArea, QFrame, \
-    QHBoxLayout
+from PyQt6.QtWidgets import QWidget, QTextEdit, QLineEdit, QPushButton, QVBoxLayout, QLabel, QFrame, \
+    QHBoxLayout, QListView
 import os
 from screens.utils.screen_style_sheet import load_custom_font
 
+# Сколько сообщений истории запрашивать за раз
+HISTORY_PAGE_SIZE = 50
+
 
 class ChatWidget(QWidget):
-    def __init__(self, user_id, chat_id, receiver_id, username, send_via_ws, update_last_msg_callback, is_group=False):
+    def __init__(self, user_id, chat_id, receiver_id, username, send_via_ws, update_last_msg_callback, is_group=False,
+                 page_size=HISTORY_PAGE_SIZE):
         super().__init__()
         self.send_via_ws = send_via_ws
         self.chat_id = chat_id
         self.user_id = user_id
         print("user_id - ", self.user_id)
-        self.nick_cache = {}
         self.receiver_id = receiver_id
         print("receiver_id - ", self.receiver_id)
         self.username = username
-        self.message = None
         self.is_group = is_group
         self.update_last_msg_callback = update_last_msg_callback
+        self.page_size = page_size
+        self.history_loading = False
+        self.history_has_more = True
+        self.history_loaded_once = False
+        # Ждём ответ на reload_history: его страница сливается, а не листается
+        self.history_refreshing = False
         if self.is_group:
             self.user_avatar_path = default_ava_path
             self.receiver_avatar_path = default_ava_path
@@ -56,8 +66,7 @@ class ChatWidget(QWidget):
         # Аватар получателя (сверху)
         self.receiver_bar_avatar = QLabel()
         selected_path = self.receiver_avatar_path if self.receiver_avatar_path else default_ava_path
-        pixmap = QPixmap(selected_path)
-        circular_pixmap = create_circular_pixmap(pixmap, 50)
+        circular_pixmap = circular_avatar(selected_path, 50)
         self.receiver_bar_avatar.setPixmap(circular_pixmap)
         self.receiver_bar_avatar.setFixedSize(50, 50)
         self.receiver_bar_avatar.setStyleSheet("background: transparent;")
@@ -92,14 +101,14 @@ class ChatWidget(QWidget):
         # =============================
 
 
-        self.scroll_area = QScrollArea()
-        self.scroll_area.setWidgetResizable(True)
-        self.scroll_area.setStyleSheet("background-color: #272428;")
-        self.messages_widget = QWidget()
-        self.messages_layout = QVBoxLayout(self.messages_widget)
-        self.messages_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
-        self.scroll_area.setWidget(self.messages_widget)
-        layout.addWidget(self.scroll_area)
+        # Сообщения рисует делегат, виджет на каждое сообщение не создаётся
+        self.messages_model = MessageListModel(
+            self.user_id, self.user_avatar_path, self.receiver_avatar_path, self.is_group, self
+        )
+        self.messages_view = MessageListView()
+        self.messages_view.setModel(self.messages_model)
+        self.messages_view.verticalScrollBar().valueChanged.connect(self.on_scroll)
+        layout.addWidget(self.messages_view)
 
         self.bottom_container = QWidget()
         self.bottom_container.setStyleSheet("""
@@ -142,89 +151,75 @@ class ChatWidget(QWidget):
         # ========== Avatars ==========
         self.user_avatar = QLabel()
         selected_path = self.user_avatar_path if self.user_avatar_path else default_ava_path
-        pixmap = QPixmap(selected_path)
-        circular_pixmap = create_circular_pixmap(pixmap, 40)
+        circular_pixmap = circular_avatar(selected_path, 40)
         self.user_avatar.setPixmap(circular_pixmap)
         self.user_avatar.setStyleSheet("background: transparent;")
 
         self.receiver_avatar = QLabel()
         selected_path = self.receiver_avatar_path if self.receiver_avatar_path else default_ava_path
-        pixmap = QPixmap(selected_path)
-        circular_pixmap = create_circular_pixmap(pixmap, 40)
+        circular_pixmap = circular_avatar(selected_path, 40)
         self.receiver_avatar.setPixmap(circular_pixmap)
         self.receiver_avatar.setStyleSheet("background: transparent;")
         # ==============================
 
 
         self.setLayout(layout)
+        self.subscribe()
+
+    # Типы сообщений, которые чат принимает сам, без маршрутизации через MainWindow
+    def ws_handlers(self):
+        return {
+            "chat_message": self.on_ws_message,
+            "group_message": self.on_ws_message,
+            "chat_history": self.on_ws_history,
+        }
+
+    def subscribe(self):
+        for message_type, handler in self.ws_handlers().items():
+            ws_dispatcher.subscribe(message_type, handler)
+
+    def unsubscribe(self):
+        for message_type, handler in self.ws_handlers().items():
+            ws_dispatcher.unsubscribe(message_type, handler)
+
+    def on_ws_message(self, data):
+        if data.get("chat_id") == self.chat_id:
+            return self.add_message(data["message"])
+
+    def on_ws_history(self, data):
+        if data.get("chat_id") == self.chat_id:
+            return self.show_history(data["messages"], data.get("has_more"))
 
     def adjust_bottom_height(self, new_text_height):
         total_height = new_text_height + 20
         self.bottom_container.setFixedHeight(total_height)
 
     async def add_message(self, data, history=None):
-        sender_id = data.get("sender_id")
-        msg_sender = "user" if sender_id == self.user_id else "receiver"
-
-        new_sender = True
-        if self.message:
-            prev_sender_id = self.message.sender_id
-            if prev_sender_id == sender_id:
-                new_sender = False
-
-        # Обёртка одного сообщения
-        message_container = QWidget()
-        message_layout = QVBoxLayout(message_container)
-        message_layout.setContentsMargins(5, 10 if new_sender else 2, 5, 0)
-        message_layout.setSpacing(2)
-
-        # Групповой чат: ник
-        if self.is_group and new_sender:
-            nickname = self.nick_cache.get(sender_id)
-            if not nickname:
-                try:
-                    user_info = await get_user_info(sender_id)
-                    print("user info - ", user_info)
-                    nickname = user_info.get("nickname", f"User {sender_id}")
-                    self.nick_cache[sender_id] = nickname
-                except Exception as e:
-                    print(f"⚠️ Не удалось получить nickname для user {sender_id}: {e}")
-                    nickname = f"User {sender_id}"
-
-            nickname_label = QLabel(nickname)
-            nickname_label.setStyleSheet("color: gray; padding-left: 45px; font-size: 11px;")
-            message_layout.addWidget(nickname_label)
-
-        # Линия с аватаркой и сообщением
-        msg_container = QWidget()
-        msg_container_layout = QHBoxLayout(msg_container)
-        msg_container_layout.setContentsMargins(0, 0, 0, 0)
-        msg_container_layout.setSpacing(5)
-
-        if new_sender:
-            avatar = QLabel()
-            selected_path = self.user_avatar_path if msg_sender == "user" else self.receiver_avatar_path
-            pixmap = QPixmap(selected_path if selected_path else default_ava_path)
-            circular_pixmap = create_circular_pixmap(pixmap, 40)
-            avatar.setPixmap(circular_pixmap)
-            avatar.setStyleSheet("background: transparent;")
-            msg_container_layout.addWidget(avatar)
-        else:
-            spacer = QWidget()
-            spacer.setFixedWidth(40)
-            msg_container_layout.addWidget(spacer)
-
-        self.message = MessageWidget(data, msg_sender)
-        self.message.sender_id = sender_id
-        msg_container_layout.addWidget(self.message)
-
-        message_layout.addWidget(msg_container)
-        self.messages_layout.addWidget(message_container)
+        self.messages_model.append_messages([data])
 
         if not history:
+            local_store.save_messages(self.chat_id, [data])
+            local_store.update_last_message(self.chat_id, data)
             self.update_last_msg_callback(data["content"])
             QTimer.singleShot(1, self.scroll_to_bottom)
 
+        # Групповой чат: ник подставляется в модель, когда станет известен
+        if self.is_group:
+            await self.resolve_nickname(data.get("sender_id"))
+
+    async def resolve_nickname(self, sender_id):
+        if self.messages_model.has_nickname(sender_id):
+            return
+        nickname = profile_cache.get_nickname(sender_id)
+        if not nickname:
+            try:
+                user_info = await load_user_info(sender_id)
+                nickname = user_info.get("nickname", f"User {sender_id}")
+            except Exception as e:
+                print(f"⚠️ Не удалось получить nickname для user {sender_id}: {e}")
+                nickname = f"User {sender_id}"
+        self.messages_model.set_nickname(sender_id, nickname)
+
     def send_message(self):
         text = self.text_input.toPlainText().strip()
 
@@ -244,13 +239,143 @@ class ChatWidget(QWidget):
         self.send_via_ws(data)
 
 
-    def show_history(self, messages_data: dict):
-        messages_data = messages_data[::-1]
-        for message_data in messages_data:
-            asyncio.create_task(self.add_message(message_data, history=True))
-        self.messages_widget.adjustSize()
-        self.messages_widget.updateGeometry()
+    def request_history(self):
+        """Запросить следующую (более старую) страницу истории."""
+        if self.history_loading or not self.history_has_more:
+            return
+        data = {"type": "chat_history", "chat_id": self.chat_id, "limit": self.page_size}
+        oldest = self.messages_model.oldest_message()
+        if self.history_loaded_once and oldest is not None:
+            # Курсор — самое старое уже показанное сообщение
+            data["before"] = oldest.get("_id")
+            data["before_timestamp"] = oldest.get("timestamp")
+        self.history_loading = True
+        self.send_via_ws(data)
+
+    def reload_history(self):
+        """Догрузить сообщения, пропущенные без связи (после переподключения).
+
+        Пагинация и прокрутка не сбрасываются: самая новая страница сливается
+        с уже показанными строками.
+        """
+        # Запрос страницы, отправленный до обрыва, ответа уже не получит
+        self.history_loading = False
+        if not self.history_loaded_once:
+            self.request_history()
+            return
+        self.history_refreshing = True
+        self.send_via_ws({"type": "chat_history", "chat_id": self.chat_id, "limit": self.page_size})
+
+    def show_cached_history(self):
+        """Последние сообщения из локальной базы, пока сервер не прислал историю."""
+        messages_data = local_store.recent_messages(self.chat_id, self.page_size)[::-1]
+        if not messages_data:
+            return
+        self.messages_model.append_messages(messages_data)
+        if self.is_group:
+            # Только локальные ники: неизвестные догрузит show_history после ответа сервера
+            for sender_id in {message.get("sender_id") for message in messages_data}:
+                nickname = profile_cache.get_nickname(sender_id) or local_store.get_nickname(sender_id)
+                if nickname:
+                    self.messages_model.set_nickname(sender_id, nickname)
         QTimer.singleShot(0, self.scroll_to_bottom)
 
+    def on_scroll(self, value):
+        # Подгружаем заранее, когда до верха осталось меньше одного экрана
+        if self.history_loaded_once and value <= self.messages_view.viewport().height():
+            self.request_history()
+
+    async def prefetch_nicknames(self, sender_ids):
+        """Ники всех неизвестных отправителей одной пачкой (склеивается в ProfileLoader)."""
+        unknown = [sender_id for sender_id in sender_ids if not self.messages_model.has_nickname(sender_id)]
+        if not unknown:
+            return
+        try:
+            profiles = await profile_loader.load_many(unknown)
+        except Exception as e:
+            print(f"⚠️ Не удалось получить nickname для user {unknown}: {e}")
+            profiles = [{}] * len(unknown)
+        for sender_id, user_info in zip(unknown, profiles):
+            self.messages_model.set_nickname(sender_id, user_info.get("nickname", f"User {sender_id}"))
+
+    async def show_history(self, messages_data: dict, has_more=None):
+        messages_data = messages_data[::-1]
+        if self.is_group:
+            await self.prefetch_nicknames({message.get("sender_id") for message in messages_data})
+        try:
+            self.insert_history(messages_data, has_more)
+        except RuntimeError:
+            # Чат закрыли, пока грузились ники
+            pass
+
+    def insert_history(self, messages_data, has_more=None):
+        """Синхронная вставка страницы истории: одна вставка в модель и один проход раскладки."""
+        if self.history_refreshing:
+            # Ответы идут по порядку запросов: первый после reload_history — его
+            self.history_refreshing = False
+            local_store.save_messages(self.chat_id, messages_data)
+            self.merge_history(messages_data)
+            return
+        self.history_loading = False
+        if has_more is None:
+            # Сервер без пагинации отдаёт всё сразу — неполная страница значит конец
+            has_more = len(messages_data) >= self.page_size
+        self.history_has_more = has_more
+        local_store.save_messages(self.chat_id, messages_data)
+
+        view = self.messages_view
+        view.setUpdatesEnabled(False)
+        try:
+            if not self.history_loaded_once:
+                self.history_loaded_once = True
+                # Сливаем по времени: уже показаны сообщения из локальной базы и живые
+                self.messages_model.merge_messages(messages_data)
+                view.doItemsLayout()
+                self.scroll_to_bottom()
+            elif not self.prepend_history(messages_data):
+                # Страница целиком из уже показанных сообщений — сервер курсор не поддерживает
+                self.history_has_more = False
+        finally:
+            view.setUpdatesEnabled(True)
+        # Если страница не заполнила экран, прокрутки не будет — догружаем сразу
+        QTimer.singleShot(0, lambda: self.on_scroll(view.verticalScrollBar().value()))
+
+    def prepend_history(self, messages_data):
+        view = self.messages_view
+        scroll_bar = view.verticalScrollBar()
+        anchor = view.indexAt(view.viewport().rect().topLeft())
+        anchor_offset = view.visualRect(anchor).top() if anchor.isValid() else 0
+
+        inserted = self.messages_model.prepend_messages(messages_data)
+        view.doItemsLayout()
+        if inserted and anchor.isValid():
+            # Оставляем на месте строку, которая была верхней до вставки
+            view.scrollTo(self.messages_model.index(anchor.row() + inserted), QListView.ScrollHint.PositionAtTop)
+            scroll_bar.setValue(scroll_bar.value() - anchor_offset)
+        return inserted
+
+    def merge_history(self, messages_data):
+        """Слить свежую страницу, оставив на месте то, что пользователь сейчас читает."""
+        view = self.messages_view
+        scroll_bar = view.verticalScrollBar()
+        at_bottom = scroll_bar.value() >= scroll_bar.maximum()
+        anchor = view.indexAt(view.viewport().rect().topLeft())
+        anchor_message = self.messages_model.row_dict(anchor.row())["data"] if anchor.isValid() else None
+        anchor_offset = view.visualRect(anchor).top() if anchor.isValid() else 0
+
+        view.setUpdatesEnabled(False)
+        try:
+            if not self.messages_model.merge_messages(messages_data):
+                return
+            view.doItemsLayout()
+            row = self.messages_model.row_of(anchor_message) if anchor_message is not None else None
+            if at_bottom or row is None:
+                self.scroll_to_bottom()
+            else:
+                view.scrollTo(self.messages_model.index(row), QListView.ScrollHint.PositionAtTop)
+                scroll_bar.setValue(scroll_bar.value() - anchor_offset)
+        finally:
+            view.setUpdatesEnabled(True)
+
     def scroll_to_bottom(self):
-        self.scroll_area.verticalScrollBar().setValue(self.scroll_area.verticalScrollBar().maximum())
\ No newline at end of file
+        self.messages_view.scrollToBottom()
@@ -15,6 +15,7 @@ from screens.utils.screen_style_sheet import load_custom_font
 from screens.utils.search_screen_profile_widget import SearchScreenProfileWidget
 from screens.utils.widgets import main_screen_line_edit_style
 from api.profile_actions import upload_avatar
+from api.profile_cache import profile_cache
 
 class SelectMembersDialog(QDialog):
     def __init__(self, data=None, preselected_members=None, parent=None):
@@ -61,6 +62,8 @@ class SelectMembersDialog(QDialog):
 
     async def populate_list_async(self, members):
         for member in members:
+            # Свежие данные профиля из общего кэша, если они там есть
+            member = profile_cache.get(member.get("id")) or member
             profile_widget = SearchScreenProfileWidget()
             await profile_widget.input_data(member, member.get("unique_name", ""))
 
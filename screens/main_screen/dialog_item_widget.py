@@ -1,8 +1,8 @@
 from PyQt6.QtWidgets import QWidget, QHBoxLayout, QLabel, QVBoxLayout
-from PyQt6.QtGui import QPixmap, QFont
+from PyQt6.QtGui import QFont
 from PyQt6.QtCore import Qt
 from screens.utils.default_avatar import default_ava_path
-from screens.utils.circular_photo import create_circular_pixmap
+from screens.utils.avatar_loader import avatar_loader
 from screens.utils.screen_style_sheet import load_custom_font
 
 
@@ -26,9 +26,8 @@ class DialogItem(QWidget):
         # ========== Avatar label ==========
         self.avatar = QLabel()
         selected_path = avatar_path if avatar_path else default_ava_path
-        pixmap = QPixmap(selected_path)
-        circular_pixmap = create_circular_pixmap(pixmap, 45)
-        self.avatar.setPixmap(circular_pixmap)
+        self.avatar.setFixedSize(45, 45)
+        avatar_loader().set_label_avatar(self.avatar, selected_path, 45)
         self.avatar.setStyleSheet("background: transparent;")
         self.layout.addWidget(self.avatar)
         # ==============================
@@ -84,7 +83,19 @@ class DialogItem(QWidget):
             self.last_msg_label.setVisible(True)
         # ==============================
 
+    def update_profile(self, username=None, avatar_path=None):
+        # ========== Обновление строки после загрузки профиля ==========
+        if username:
+            self.full_username = username
+            self.username = username
+            self.set_compact_mode(self.compact_mode)
+        if avatar_path:
+            avatar_loader().set_label_avatar(self.avatar, avatar_path, 45)
+            self.ava = avatar_path
+        # ==============================
+
     def update_last_message(self, text):
+        self.last_msg_text = text
         if text:
             if len(text) <= 18:
                 msg_text = text.replace("\n", " ")
@@ -1,20 +1,23 @@
 import asyncio
-import json
+import logging
 import os
+import time
 from PyQt6.QtWidgets import QMainWindow, QVBoxLayout, QListWidget, QHBoxLayout, QPushButton, QListWidgetItem, QWidget, \
     QApplication, QSizePolicy, QMessageBox
-from PyQt6.QtCore import pyqtSlot, Qt, QEvent, QPropertyAnimation, QEasingCurve
+from PyQt6.QtCore import pyqtSlot, Qt, QEvent, QPropertyAnimation, QEasingCurve, QModelIndex
 from PyQt6.QtGui import QPalette, QColor, QCursor
 from aiortc import RTCSessionDescription, RTCPeerConnection
-from qasync import asyncSlot
 
 from backend.delete_token import clear_token_value
 from screens.main_screen.call_widget import CallWidget
 from screens.main_screen.create_group_widget import CreateGroupWidget
 from screens.main_screen.edit_profile_dialog import EditProfileDialog
 from screens.main_screen.search_user import UserSearchWidget
-from api.profile_actions import get_user_info, download_avatar, get_avatar_path
+from api.profile_actions import load_user_info, download_avatar, get_avatar_path
 from api.common import token_manager
+from api.avatar_cache import avatar_cache
+from api.local_store import local_store, apply_init_delta
+from api.profile_cache import profile_cache
 from screens.main_screen.chat_widget import ChatWidget
 from screens.main_screen.dialog_item_widget import DialogItem
 from screens.utils.animate_button import StyledAnimatedButton
@@ -22,11 +25,17 @@ from screens.utils.default_avatar import default_ava_path
 from screens.utils.incoming_call_widget import IncomingCallWidget
 from screens.utils.my_profile_widget import MyProfile
 from screens.main_screen.web_socket import WebSocketClient
+from screens.main_screen.ws_dispatcher import ws_dispatcher
 from screens.utils.screen_style_sheet import screen_style, load_custom_font
 from screens.utils.list_utils import configure_list_widget_no_hscroll
 
 class MainWindow(QMainWindow):
-    def __init__(self, audio):
+    # Сколько профилей диалогов грузим одновременно при старте
+    BOOTSTRAP_CONCURRENCY = 8
+    # Ник строки, пока профиль собеседника не загружен и не найден в кэшах
+    LOADING_NICKNAME = "Загрузка..."
+
+    def __init__(self, audio, connect=True):
         super().__init__()
         self.user2_id = None
         self.chat_widget = None
@@ -47,10 +56,15 @@ class MainWindow(QMainWindow):
         central_widget.setLayout(main_layout)
         self.setStyleSheet(screen_style)
 
+        self.register_ws_handlers()
         self.client = WebSocketClient(token=token_manager.get_access_token())
         self.client.message_received.connect(self.handle_ws_message)
         self.client.connected.connect(self.get_init_data)
-        self.client.connect()
+        self.client.state_changed.connect(self.on_connection_state_changed)
+        token_manager.add_access_token_listener(self.client.set_token)
+        # При тёплом старте подключаемся после проверки токена (start_connection)
+        if connect:
+            self.client.connect()
         # Задаем константы для размеров
         self.DIALOGS_COMPACT_WIDTH = 120
         self.DIALOGS_EXPANDED_WIDTH = 200
@@ -264,6 +278,22 @@ class MainWindow(QMainWindow):
 
         self.call_layout = QVBoxLayout()
         main_layout.addLayout(self.call_layout, 1)
+        self.groups_list.itemClicked.connect(self.on_group_item_clicked)
+
+        self.show_cached_state()
+
+    def show_cached_state(self):
+        """Тёплый старт: диалоги и группы из локальной базы, пока сервер не прислал init."""
+        started = time.perf_counter()
+        cached = local_store.load_init()
+        if not cached:
+            return
+        self.user_start_data = cached
+        self.sync_dialog_rows()
+        self.sync_group_rows()
+        # Только локальные данные: до проверки токена запрос в сеть начал бы свой refresh
+        self.profile_widget.sync_input_data(cached)
+        logging.info(f"⏱️ Тёплый старт из локальной базы: {(time.perf_counter() - started) * 1000:.1f} мс")
 
     def set_active_list(self, list_name):
         if list_name == self.active_list:
@@ -456,81 +486,130 @@ class MainWindow(QMainWindow):
             if widget:
                 widget.set_compact_mode(False)
 
+    def on_connection_state_changed(self, state):
+        titles = {
+            "connecting": "ZetCord — подключение...",
+            "reconnecting": "ZetCord — нет соединения, переподключение...",
+            "closed": "ZetCord — не в сети",
+        }
+        self.setWindowTitle(titles.get(state, "ZetCord"))
+
     def get_init_data(self):
-        if self.dialogs_list:
-            self.dialogs_list.clear()
-        self.client.send_json({"type": "init"})
+        data = {"type": "init"}
+        if self.user_start_data:
+            # Есть локальный снимок — просим только изменения после курсора
+            data["sync"] = local_store.sync_cursor()
+        self.client.send_json(data)
 
     def search_user(self):
         search_user_widget = UserSearchWidget(self.open_chat, self.insert_item_to_dialog_list, self.focus_to_widget, parent=self, cur_user=self.user_start_data['profile_data']["id"], get_init_data=self.get_init_data)
         search_user_widget.show()
 
-    @asyncSlot(str)
-    async def handle_ws_message(self, message: str):
-
-        try:
-
-            print(f"📬 Получено WebSocket-сообщение: {message}")
-            data = json.loads(message)
-            message_type = data.get("type")
-            if message_type != "chat_history":
-                print(f"Received message: {data}")
-
-            print(f"Тип сообщения: {message_type}")
-
-            if message_type == "init":
-                del data["type"]
-                print("MainWindow: init data get")
-                self.user_start_data = data
-
-                self.dialogs_list.clear()
-                self.groups_list.clear()
-                await self.fill_dialog_list()
-                await self.fill_group_list()
-                print("вызов input_data - ",self.user_start_data)
-                await self.profile_widget.input_data(self.user_start_data)
-
-            elif message_type == "chat_message":
-                if data["chat_id"] == self.cur_chat_id:
-                    if self.chat_widget:
-                        asyncio.create_task(self.chat_widget.add_message(data["message"]))
-
-            elif message_type == "chat_history":
-                print("получено история:", data["type"])
-                if data["chat_id"] == self.cur_chat_id:
-                    if self.chat_widget:
-                        self.chat_widget.show_history(data["messages"])
-
-            elif message_type == "group_message":
-                if data["chat_id"] == self.cur_chat_id:
-                    if self.chat_widget:
-                        asyncio.create_task(self.chat_widget.add_message(data["message"]))
-
-            elif message_type == "offer":
-                await self.handle_call_offer(data)
-
-            elif message_type == "answer":
-                await self.handle_call_answer(data)
-
-            elif message_type == "ice_candidate":
-                await self.handle_ice_candidate(data)
-
-            elif message_type == "call_rejected":
-                self.handle_call_rejected(data)
-
-            elif message_type == "end_call":
-                self.handle_call_ended(data)
+    def ws_handlers(self):
+        # Чат подписывается сам (ChatWidget), здесь — то, что живёт в главном окне
+        return {
+            "init": self.handle_init,
+            "chat_message": self.handle_chat_message,
+            "group_message": self.handle_chat_message,
+            "profile_updated": self.handle_profile_updated,
+            "offer": self.handle_call_offer,
+            "answer": self.handle_call_answer,
+            "ice_candidate": self.handle_ice_candidate,
+            "call_rejected": self.handle_call_rejected,
+            "end_call": self.handle_call_ended,
+        }
+
+    def register_ws_handlers(self):
+        for message_type, handler in self.ws_handlers().items():
+            ws_dispatcher.subscribe(message_type, handler)
+
+    def unregister_ws_handlers(self):
+        for message_type, handler in self.ws_handlers().items():
+            ws_dispatcher.unsubscribe(message_type, handler)
+
+    def start_connection(self):
+        """Подключение WebSocket после фоновой проверки токена (тёплый старт)."""
+        self.client.set_token(token_manager.get_access_token())
+        self.client.connect()
 
-            else:
-                print(f"⚠️ Неизвестный тип сообщения: {message_type}")
+    def discard(self):
+        """Закрыть окно без выхода из приложения: сохранённый токен отвергнут."""
+        self.unregister_ws_handlers()
+        if self.chat_widget:
+            self.chat_widget.unsubscribe()
+        token_manager.remove_access_token_listener(self.client.set_token)
+        self.client.close()
+        self.close()
+        self.deleteLater()
+
+    def handle_ws_message(self, data: dict):
+        # JSON уже разобран в WebSocketClient
+        if isinstance(data, dict):
+            ws_dispatcher.dispatch(data)
+
+    async def handle_init(self, data):
+        data = dict(data)
+        del data["type"]
+        print("MainWindow: init data get")
+        if data.pop("delta", False) and self.user_start_data:
+            data = apply_init_delta(self.user_start_data, data)
+        self.user_start_data = data
+
+        # Списки не пересоздаются: меняются только строки, которые изменились
+        local_store.save_init(data)
+        if self.chat_widget:
+            # Открытый чат догружает пропущенное, не сбрасывая пагинацию и прокрутку
+            self.chat_widget.reload_history()
+        await self.fill_dialog_list()
+        await self.fill_group_list()
+        await self.profile_widget.input_data(self.user_start_data)
+
+    def handle_chat_message(self, data):
+        """Сообщение в неоткрытый чат: превью строки, порядок списка и локальная база."""
+        chat_id = data.get("chat_id")
+        message = data.get("message")
+        if chat_id is None or not isinstance(message, dict):
+            return
+        if self.chat_widget and self.chat_widget.chat_id == chat_id:
+            # Открытый чат сохраняет сообщение и обновляет превью сам (ChatWidget.add_message)
+            return
+        local_store.save_messages(chat_id, [message])
+        local_store.update_last_message(chat_id, message)
+
+        is_group = data.get("type") == "group_message"
+        key, list_key = ("groups_data", "groups") if is_group else ("chats_data", "chats")
+        chats = ((self.user_start_data or {}).get(key) or {}).get(list_key) or []
+        for index, chat in enumerate(chats):
+            if chat.get("_id") == chat_id:
+                chat["last_message"] = message
+                chats.insert(0, chats.pop(index))
+                break
+
+        list_widget = self.groups_list if is_group else self.dialogs_list
+        widget = self.list_widgets_by_chat_id(list_widget).get(chat_id)
+        if widget is None:
+            # Чата ещё нет в списке (новый собеседник) — просим дельту init
+            self.get_init_data()
+            return
+        widget.update_last_message(message.get("content"))
+        self.move_row(list_widget, widget, 0)
 
-        except json.JSONDecodeError as e:
-            print(f"❌ Ошибка при парсинге JSON: {e}")
-            print(f"Сообщение: {message}")
-        except Exception as e:
-            print(f"❌ Неожиданная ошибка при обработке WebSocket сообщения: {e}")
-            import traceback
-            traceback.print_exc()
+    def handle_profile_updated(self, data):
+        """Сброс кэша профиля после изменения ника/аватара пользователя"""
+        user_id = data.get("user_id")
+        if user_id is None:
+            return
+        profile = data.get("profile")
+        if profile:
+            profile_cache.set(user_id, profile)
+        else:
+            profile_cache.invalidate(user_id)
+        # Аватар перепроверим по ETag при следующем обращении
+        avatar_cache.mark_stale(user_id)
+        for index in range(self.dialogs_list.count()):
+            widget = self.dialogs_list.itemWidget(self.dialogs_list.item(index))
+            if widget and getattr(widget, "user_id", None) == user_id and profile:
+                widget.update_profile(profile.get("nickname"))
 
     async def handle_call_offer(self, data):
         """Обработка входящего звонка (offer)"""
@@ -551,7 +630,7 @@ class MainWindow(QMainWindow):
                     "to_user_id": from_user.get("id"),
                     "reason": "busy"
                 }
-                self.send_via_ws(json.dumps(reject_message))
+                self.send_via_ws(reject_message)
                 return
 
             # Создаем виджет входящего звонка
@@ -585,7 +664,6 @@ class MainWindow(QMainWindow):
         """Обработка ответа на звонок (answer)"""
         try:
             print(f"📨 Получен ответ (answer)")
-            print(data)
             answer = data.get("answer")
             from_user_id = data.get("from")
 
@@ -622,7 +700,6 @@ class MainWindow(QMainWindow):
 
     async def handle_ice_candidate(self, data):
 
-        print(f"Received ICE candidate message: {data}")
         from_user_id = data.get("from")
         candidate = data.get("candidate")
         if not candidate:
@@ -882,10 +959,9 @@ class MainWindow(QMainWindow):
     def open_chat(self, chat_id, receiver_id, username, is_group=False):
         self.cur_chat_id = chat_id
         if self.chat_widget:
+            self.chat_widget.unsubscribe()
             self.chat_widget.deleteLater()
 
-        data = {"type": "chat_history", "chat_id": chat_id}
-
         # Модифицируем создание ChatWidget для поддержки групп
         self.chat_widget = ChatWidget(
             user_id=self.user_start_data["profile_data"]["id"],
@@ -896,7 +972,10 @@ class MainWindow(QMainWindow):
             update_last_msg_callback=self.update_last_msg,
             is_group=is_group
         )
-        self.send_via_ws(data)
+        # Сразу показываем последние сообщения с диска, страница сервера потом сольётся с ними
+        self.chat_widget.show_cached_history()
+        # Первой загружается только самая новая страница, остальное — при прокрутке вверх
+        self.chat_widget.request_history()
         self.chat_layout.addWidget(self.chat_widget)
 
     def update_last_msg(self, text):
@@ -904,61 +983,144 @@ class MainWindow(QMainWindow):
             self.cur_widget.update_last_message(text)
 
     def send_via_ws(self, message_data: dict):
-        print(f"📤 Отправка WebSocket-сообщения: {message_data}")
         self.client.send_json(message_data)
 
     async def fill_dialog_list(self):
         self.chats = []
-        dialogs = self.user_start_data['chats_data']['chats']
-        print("dialogs - ", dialogs)
-
-        if not dialogs:
+        started = time.perf_counter()
+        rows = self.sync_dialog_rows()
+        if not rows:
             return
-        for dialog in dialogs:
+
+        semaphore = asyncio.Semaphore(self.BOOTSTRAP_CONCURRENCY)
+
+        async def load_row(widget, user2_id, need_avatar):
+            # Профили всех строк склеиваются загрузчиком в один запрос
+            user2 = await load_user_info(user2_id)
+            avatar_path = None
+            if need_avatar:
+                async with semaphore:
+                    avatar_path = await download_avatar(user2_id)
+            if "request error" not in user2:
+                nickname = user2.get("nickname") or "Unknown"
+            else:
+                # Профиль не загрузился — ник из кэша или снимка остаётся как был
+                nickname = "Unknown" if widget.username == self.LOADING_NICKNAME else None
+            widget.update_profile(nickname, avatar_path)
+            return user2
+
+        results = await asyncio.gather(*(load_row(*row) for row in rows), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"⚠️ Не удалось загрузить профиль диалога: {result}")
+            elif "request error" not in result:
+                self.chats.append(result)
+        local_store.save_profiles(self.chats)
+        logging.info(f"⏱️ Список диалогов загружен: {len(rows)} шт. за "
+                     f"{(time.perf_counter() - started) * 1000:.1f} мс")
+
+    @staticmethod
+    def list_widgets_by_chat_id(list_widget):
+        widgets = {}
+        for index in range(list_widget.count()):
+            widget = list_widget.itemWidget(list_widget.item(index))
+            if widget:
+                widgets[widget.chat_id] = widget
+        return widgets
+
+    @staticmethod
+    def remove_missing_rows(list_widget, chat_ids):
+        for index in range(list_widget.count() - 1, -1, -1):
+            widget = list_widget.itemWidget(list_widget.item(index))
+            if widget is None or widget.chat_id not in chat_ids:
+                list_widget.takeItem(index)
+
+    @staticmethod
+    def move_row(list_widget, widget, position):
+        """Переставить строку с widget на position, не пересоздавая виджет.
+
+        Строки выше position уже стоят по порядку сервера, поэтому ищем ниже.
+        """
+        for index in range(position, list_widget.count()):
+            if list_widget.itemWidget(list_widget.item(index)) is widget:
+                if index != position:
+                    list_widget.model().moveRow(QModelIndex(), index, QModelIndex(), position)
+                return
+
+    def sync_dialog_rows(self):
+        """Привести список диалогов к self.user_start_data, не пересоздавая неизменные строки.
+
+        Возвращает (виджет, id собеседника, нужен ли аватар) для догрузки профилей.
+        """
+        dialogs = self.user_start_data['chats_data']['chats'] or []
+        self.remove_missing_rows(self.dialogs_list, {dialog.get("_id") for dialog in dialogs})
+        existing = self.list_widgets_by_chat_id(self.dialogs_list)
+        started = time.perf_counter()
+        cur_user_id = self.user_start_data["profile_data"].get("id")
+        rows = []
+        for position, dialog in enumerate(dialogs):
             last_msg = ""
             if dialog.get("last_message") is not None:
                 last_msg = dialog["last_message"].get("content")
-            if self.user_start_data["profile_data"].get("id") == dialog.get("user1_id"):
-                self.user2_id = dialog.get("user2_id")
+            if cur_user_id == dialog.get("user1_id"):
+                user2_id = dialog.get("user2_id")
             else:
-                self.user2_id = dialog.get("user1_id")
-            user2 = await get_user_info(self.user2_id)
-            print("скачиваю аватарки...")
-            avatar_path = await download_avatar(self.user2_id)
-            print("аватар путь:", avatar_path)
-            self.widget = self.insert_item_to_dialog_list(
-                username=user2.get("nickname"),
+                user2_id = dialog.get("user1_id")
+            widget = existing.get(dialog.get("_id"))
+            if widget is not None:
+                if widget.last_msg_text != last_msg:
+                    widget.update_last_message(last_msg)
+                # Чат с новым сообщением поднимается туда, где его поставил сервер
+                self.move_row(self.dialogs_list, widget, position)
+                rows.append((widget, user2_id, widget.ava == default_ava_path))
+                continue
+            widget = self.insert_item_to_dialog_list(
+                username=profile_cache.get_nickname(user2_id) or local_store.get_nickname(user2_id) or self.LOADING_NICKNAME,
                 last_msg=last_msg,
-                avatar_path=avatar_path,
+                avatar_path=get_avatar_path(user2_id),
                 chat_id=dialog.get("_id"),
-                user_id=self.user2_id
+                user_id=user2_id,
+                row=position
             )
-            self.chats.append(user2)
+            if not rows:
+                logging.info(f"⏱️ Первая строка диалогов: {(time.perf_counter() - started) * 1000:.1f} мс")
+            rows.append((widget, user2_id, True))
         self.item_widgets = [self.dialogs_list.itemWidget(self.dialogs_list.item(i)) for i in
                              range(self.dialogs_list.count())]
-        print("item widgets: ", self.item_widgets)
-        print("all contacts: ", self.chats)
+        return rows
 
     async def fill_group_list(self):
-        groups = self.user_start_data["groups_data"]["groups"]
-        print("groups - ", groups)
-        if not groups:
-            return
-        for group in groups:
+        self.sync_group_rows()
+
+    def sync_group_rows(self):
+        groups = self.user_start_data["groups_data"]["groups"] or []
+        self.remove_missing_rows(self.groups_list, {group["_id"] for group in groups})
+        existing = self.list_widgets_by_chat_id(self.groups_list)
+        for position, group in enumerate(groups):
+            widget = existing.get(group["_id"])
+            if widget is not None:
+                last_msg = group["last_message"]
+                last_msg = last_msg["content"] if isinstance(last_msg, dict) else last_msg
+                if widget.last_msg_text != last_msg:
+                    widget.update_last_message(last_msg)
+                if widget.username != group["name"]:
+                    widget.update_profile(username=group["name"])
+                widget.user_id = group["member_ids"]
+                self.move_row(self.groups_list, widget, position)
+                continue
             widget = self.insert_item_to_group_list(
                 avatar_path=group["avatar"],
                 name=group["name"],
                 last_msg=group["last_message"],
                 group_id=group["_id"],
-                member_ids=group["member_ids"]
+                member_ids=group["member_ids"],
+                row=position
             )
             # Добавляем обработчик клика
-            item = self.groups_list.item(self.groups_list.count()-1)
+            item = self.groups_list.item(min(position, self.groups_list.count() - 1))
             item.widget = widget
-        # Подключаем обработчик кликов по группам
-        self.groups_list.itemClicked.connect(self.on_group_item_clicked)
 
-    def insert_item_to_dialog_list(self, username, last_msg, avatar_path, chat_id, user_id):
+    def insert_item_to_dialog_list(self, username, last_msg, avatar_path, chat_id, user_id, row=None):
         widget = DialogItem(
             username=username,
             last_msg=last_msg,
@@ -968,16 +1130,18 @@ class MainWindow(QMainWindow):
         )
         item = QListWidgetItem()
         item.setSizeHint(widget.sizeHint())
-        self.dialogs_list.addItem(item)
+        if row is None:
+            self.dialogs_list.addItem(item)
+        else:
+            self.dialogs_list.insertItem(row, item)
         self.dialogs_list.setItemWidget(item, widget)
+        if chat_id is not None and chat_id == self.cur_chat_id:
+            # Список пересобран (тёплый старт -> init), открытый чат должен обновлять новую строку
+            self.cur_widget = widget
         return widget
 
-    def insert_item_to_group_list(self,  avatar_path, name, last_msg, group_id, member_ids):
-        avatar = get_avatar_path(avatar_path)
-        if avatar == 1:
-            ava = default_ava_path
-        else:
-            ava = avatar
+    def insert_item_to_group_list(self,  avatar_path, name, last_msg, group_id, member_ids, row=None):
+        ava = get_avatar_path(avatar_path) or default_ava_path
         widget = DialogItem(username=name,
                             last_msg=last_msg["content"] if isinstance(last_msg, dict) else last_msg,
                             avatar_path=ava,
@@ -985,8 +1149,13 @@ class MainWindow(QMainWindow):
                             user_id=member_ids)
         item = QListWidgetItem()
         item.setSizeHint(widget.sizeHint())
-        self.groups_list.addItem(item)
+        if row is None:
+            self.groups_list.addItem(item)
+        else:
+            self.groups_list.insertItem(row, item)
         self.groups_list.setItemWidget(item, widget)
+        if group_id == self.cur_chat_id:
+            self.cur_widget = widget
         return widget
 
     def get_list_index(self, target_id):
@@ -1026,6 +1195,7 @@ class MainWindow(QMainWindow):
 
         if reply == QMessageBox.StandardButton.Yes:
             clear_token_value()
+            local_store.clear()
             QApplication.quit()
 
     def settings(self):
@@ -1,51 +1,211 @@
-from PyQt6.QtCore import QObject, QUrl, pyqtSlot, pyqtSignal
-from PyQt6.QtWebSockets import QWebSocket, QWebSocketProtocol
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QTextEdit, QLabel, QLineEdit, QPushButton
-import json
+import asyncio
+import random
+import time
+from collections import deque
+
+from PyQt6.QtCore import QObject, QUrl, QTimer, pyqtSlot, pyqtSignal
+from PyQt6.QtWebSockets import QWebSocket, QWebSocketHandshakeOptions
+from PyQt6.QtNetwork import QAbstractSocket, QNetworkRequest
+
+from api import codec
+from api.common import token_manager
+
+
 class WebSocketClient(QObject):
-    message_received = pyqtSignal(str)
+    """WebSocket с переподключением, heartbeat и очередью исходящих.
+
+    Пока соединения нет, send_json складывает сообщения в ограниченную очередь,
+    после подключения они уходят первыми. Разрыв лечится переподключением с
+    экспоненциальной задержкой и джиттером, мёртвое соединение — по пропущенным pong.
+
+    Формат кадров согласуется подпротоколом: если сервер выбрал MessagePack,
+    сообщения уходят бинарными кадрами, иначе — текстовым JSON.
+    """
+
+    # Кадр разбирается один раз здесь, дальше ходит уже dict
+    message_received = pyqtSignal(object)
     connected = pyqtSignal()
-    def __init__(self, token, parent=None):
+    disconnected = pyqtSignal()
+    # "connecting", "connected", "reconnecting", "closed"
+    state_changed = pyqtSignal(str)
+
+    RECONNECT_BASE_DELAY = 0.5
+    RECONNECT_MAX_DELAY = 30.0
+    PING_INTERVAL_MS = 15_000
+    # Сколько интервалов без pong считаем соединение мёртвым
+    MISSED_PONGS_LIMIT = 2
+    OUTBOUND_QUEUE_LIMIT = 256
+    SUBPROTOCOL_MSGPACK = "zetcord.msgpack.v1"
+    SUBPROTOCOL_JSON = "zetcord.json.v1"
+
+    def __init__(self, token, parent=None, prefer_binary=None):
         super().__init__()
         self.token = token
+        self.prefer_binary = codec.msgpack is not None if prefer_binary is None else prefer_binary
+        # Согласованный формат текущего соединения
+        self.binary = False
+        self.state = "closed"
+        self.reconnect_attempt = 0
+        self.closing = False
+        self.outbound = deque(maxlen=self.OUTBOUND_QUEUE_LIMIT)
+        self.dropped_messages = 0
+        self.last_pong = time.monotonic()
+
         self.socket = QWebSocket()
         self.socket.connected.connect(self.on_connected)
         self.socket.textMessageReceived.connect(self.on_message_received)
+        self.socket.binaryMessageReceived.connect(self.on_binary_message_received)
         self.socket.disconnected.connect(self.on_disconnected)
         self.socket.errorOccurred.connect(self.on_error)
+        self.socket.pong.connect(self.on_pong)
+
+        self.ping_timer = QTimer(self)
+        self.ping_timer.setInterval(self.PING_INTERVAL_MS)
+        self.ping_timer.timeout.connect(self.send_ping)
+
+        self.reconnect_timer = QTimer(self)
+        self.reconnect_timer.setSingleShot(True)
+        self.reconnect_timer.timeout.connect(self.reconnect)
+
+    def set_token(self, token):
+        # Новый access-токен используется при следующем подключении
+        self.token = token
+
+    def set_state(self, state):
+        if state != self.state:
+            self.state = state
+            self.state_changed.emit(state)
+
+    def is_connected(self):
+        return self.socket.state() == QAbstractSocket.SocketState.ConnectedState
 
     def connect(self):
         # localhost:8000
-        url = QUrl(f"ws://localhost:8000/ws?token={self.token}")
-        print()
-        self.socket.open(url)
+        self.closing = False
+        self.set_state("connecting" if self.reconnect_attempt == 0 else "reconnecting")
+        url = f"ws://localhost:8000/ws?token={self.token}"
+        options = QWebSocketHandshakeOptions()
+        if self.prefer_binary:
+            url += "&encoding=msgpack"
+            options.setSubprotocols([self.SUBPROTOCOL_MSGPACK, self.SUBPROTOCOL_JSON])
+        else:
+            options.setSubprotocols([self.SUBPROTOCOL_JSON])
+        self.socket.open(QNetworkRequest(QUrl(url)), options)
 
     @pyqtSlot()
     def on_connected(self):
+        self.binary = self.prefer_binary and self.socket.subprotocol() == self.SUBPROTOCOL_MSGPACK
+        self.reconnect_attempt = 0
+        self.last_pong = time.monotonic()
+        self.ping_timer.start()
+        self.set_state("connected")
+        self.flush_outbound()
         self.connected.emit()
 
     @pyqtSlot(str)
     def on_message_received(self, message):
-        self.message_received.emit(message)
-        data = json.loads(message)
-        # print("получено сообщение: ", data)
+        try:
+            data = codec.loads(message)
+        except ValueError as e:
+            print(f"❌ Ошибка при парсинге JSON ({len(message)} байт): {e}")
+            return
+        self.message_received.emit(data)
 
-    @pyqtSlot()
-    def send_json(self, data:dict):
-        # Формируем JSON-сообщение
-        message = json.dumps(data)
-        self.socket.sendTextMessage(message)
-        print("данные отправлены:", data)
+    def on_binary_message_received(self, message):
+        # Бинарные кадры принимаем всегда: сервер мог включить их по параметру encoding
+        message = bytes(message)
+        try:
+            data = codec.unpack(message)
+        except Exception as e:
+            print(f"❌ Ошибка при разборе бинарного кадра ({len(message)} байт): {e}")
+            return
+        self.message_received.emit(data)
+
+    def send_frame(self, data: dict):
+        if self.binary:
+            self.socket.sendBinaryMessage(codec.pack(data))
+        else:
+            self.socket.sendTextMessage(codec.dumps(data))
+
+    def send_json(self, data: dict):
+        # Кодируем при отправке: формат известен только после подключения
+        if self.is_connected():
+            self.send_frame(data)
+            return
+        if len(self.outbound) == self.outbound.maxlen:
+            self.dropped_messages += 1
+            if self.dropped_messages % 100 == 1:
+                print(f"Очередь исходящих переполнена, отброшено сообщений: {self.dropped_messages}")
+        self.outbound.append(data)
 
+    def flush_outbound(self):
+        while self.outbound and self.is_connected():
+            self.send_frame(self.outbound.popleft())
+
+    # ================= Heartbeat =================
+    def send_ping(self):
+        missed = (time.monotonic() - self.last_pong) * 1000 / self.PING_INTERVAL_MS
+        if missed > self.MISSED_PONGS_LIMIT:
+            print("Сервер не отвечает на ping, переподключение")
+            # abort() закрывает без рукопожатия — дальше сработает on_disconnected
+            self.socket.abort()
+            return
+        self.socket.ping(b"")
+
+    def on_pong(self, elapsed_time, payload):
+        self.last_pong = time.monotonic()
+
+    # ================= Переподключение =================
     @pyqtSlot()
     def on_disconnected(self):
-        print("отключено")
+        self.ping_timer.stop()
+        self.disconnected.emit()
+        if self.closing:
+            self.set_state("closed")
+            return
+        self.schedule_reconnect()
+
+    def schedule_reconnect(self):
+        if self.reconnect_timer.isActive():
+            return
+        # Экспоненциальная задержка с полным джиттером, чтобы клиенты не шли волной
+        delay = min(self.RECONNECT_MAX_DELAY, self.RECONNECT_BASE_DELAY * 2 ** self.reconnect_attempt)
+        delay = random.uniform(0, delay)
+        self.reconnect_attempt += 1
+        self.set_state("reconnecting")
+        print(f"отключено, переподключение через {delay:.1f} с (попытка {self.reconnect_attempt})")
+        self.reconnect_timer.start(int(delay * 1000))
+
+    def reconnect(self):
+        asyncio.ensure_future(self._reconnect())
+
+    async def _reconnect(self):
+        if self.closing:
+            return
+        # С просроченным токеном сервер всё равно закроет соединение — обновляем заранее
+        expiry = token_manager.get_access_token_expiry()
+        if expiry is None or expiry - time.time() < token_manager.REFRESH_MARGIN:
+            try:
+                await token_manager.refresh(stale_token=self.token)
+            except Exception as e:
+                print("Не удалось обновить токен перед переподключением:", e)
+            self.token = token_manager.get_access_token() or self.token
+        if not self.closing:
+            self.connect()
 
     def close(self):
         print("ChatClient socket closed")
+        self.closing = True
+        self.reconnect_timer.stop()
+        self.ping_timer.stop()
         if self.socket.isValid():
             self.socket.close()
+        else:
+            self.set_state("closed")
 
     @pyqtSlot()
     def on_error(self):
-        print(f"Ошибка: {self.socket.errorString()}")
\ No newline at end of file
+        print(f"Ошибка: {self.socket.errorString()}")
+        # Неудачная попытка подключения не всегда даёт disconnected
+        if not self.closing and self.socket.state() == QAbstractSocket.SocketState.UnconnectedState:
+            self.schedule_reconnect()
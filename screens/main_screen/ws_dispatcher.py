@@ -0,0 +1,101 @@
+import asyncio
+import bisect
+import inspect
+import time
+import traceback
+from typing import Callable
+
+
+class DispatchStats:
+    # Верхние границы корзин гистограммы задержки обработчиков, мс
+    BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000)
+
+    def __init__(self):
+        self.messages = 0
+        self.handled = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.histogram = [0] * (len(self.BUCKETS_MS) + 1)
+
+    def record(self, elapsed: float):
+        self.handled += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        self.histogram[bisect.bisect_left(self.BUCKETS_MS, elapsed * 1000)] += 1
+
+    def as_dict(self) -> dict:
+        labels = [f"<={bucket}ms" for bucket in self.BUCKETS_MS] + [f">{self.BUCKETS_MS[-1]}ms"]
+        return {
+            "messages": self.messages,
+            "handled": self.handled,
+            "errors": self.errors,
+            "avg_ms": self.total_time / self.handled * 1000 if self.handled else 0.0,
+            "max_ms": self.max_time * 1000,
+            "histogram": dict(zip(labels, self.histogram)),
+        }
+
+
+class MessageDispatcher:
+    """Маршрутизация WebSocket-сообщений по полю type.
+
+    Подсистемы (чат, звонки, профиль) подписываются на свои типы сами, без
+    цепочки if/elif в MainWindow. Обработчик может быть обычной функцией или
+    корутиной — корутина запускается отдельной задачей.
+    """
+
+    def __init__(self):
+        self._handlers: dict[str, list[Callable]] = {}
+        self.stats: dict[str, DispatchStats] = {}
+
+    def subscribe(self, message_type: str, handler: Callable):
+        handlers = self._handlers.setdefault(message_type, [])
+        if handler not in handlers:
+            handlers.append(handler)
+
+    def unsubscribe(self, message_type: str, handler: Callable):
+        handlers = self._handlers.get(message_type)
+        if handlers and handler in handlers:
+            handlers.remove(handler)
+
+    def dispatch(self, data: dict):
+        message_type = data.get("type")
+        stats = self.stats.setdefault(message_type, DispatchStats())
+        stats.messages += 1
+        handlers = self._handlers.get(message_type)
+        if not handlers:
+            print(f"⚠️ Неизвестный тип сообщения: {message_type}")
+            return
+        for handler in list(handlers):
+            started = time.perf_counter()
+            try:
+                result = handler(data)
+            except Exception as e:
+                stats.errors += 1
+                print(f"❌ Ошибка в обработчике {message_type}: {e}")
+                traceback.print_exc()
+                continue
+            if inspect.isawaitable(result):
+                task = asyncio.ensure_future(result)
+                task.add_done_callback(lambda done, stats=stats, started=started, message_type=message_type:
+                                       self._on_task_done(done, stats, started, message_type))
+            else:
+                stats.record(time.perf_counter() - started)
+
+    @staticmethod
+    def _on_task_done(task: asyncio.Future, stats: DispatchStats, started: float, message_type: str):
+        stats.record(time.perf_counter() - started)
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            stats.errors += 1
+            print(f"❌ Ошибка в обработчике {message_type}: {error}")
+            traceback.print_exception(error)
+
+    def get_stats(self) -> dict[str, dict]:
+        """Снимок счётчиков и гистограмм задержки по типам сообщений."""
+        return {message_type: stats.as_dict() for message_type, stats in self.stats.items()}
+
+
+ws_dispatcher = MessageDispatcher()
@@ -0,0 +1,112 @@
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal, Qt
+from PyQt6.QtGui import QImage, QPixmap, QPixmapCache, QPainter, QColor
+
+from screens.utils.circular_photo import avatar_cache_key, find_cached_avatar, create_circular_image
+
+
+class _AvatarSignals(QObject):
+    finished = pyqtSignal(str, QImage)
+
+
+class _AvatarTask(QRunnable):
+    def __init__(self, key, path, size, signals):
+        super().__init__()
+        self.key = key
+        self.path = path
+        self.size = size
+        self.signals = signals
+
+    def run(self):
+        # Декодирование, масштабирование и маска — на QImage в рабочем потоке
+        image = create_circular_image(self.path, self.size)
+        self.signals.finished.emit(self.key, image)
+
+
+class AvatarLoader(QObject):
+    """Фоновая подготовка круглых аватаров в QThreadPool.
+
+    Готовый QImage возвращается в GUI-поток сигналом, там превращается в
+    QPixmap, кладётся в QPixmapCache и раздаётся всем, кто его ждал.
+    """
+
+    def __init__(self, max_threads=2, parent=None):
+        super().__init__(parent)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max_threads)
+        self._signals = _AvatarSignals()
+        self._signals.finished.connect(self._on_finished, Qt.ConnectionType.QueuedConnection)
+        self._waiters = {}
+        self._placeholders = {}
+
+    def placeholder(self, size):
+        """Серый круг, пока настоящий аватар готовится."""
+        pixmap = self._placeholders.get(size)
+        if pixmap is None:
+            pixmap = QPixmap(size, size)
+            pixmap.fill(Qt.GlobalColor.transparent)
+            painter = QPainter(pixmap)
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(QColor("#3a3540"))
+            painter.drawEllipse(0, 0, size, size)
+            painter.end()
+            self._placeholders[size] = pixmap
+        return pixmap
+
+    def request(self, path, size, callback):
+        """callback(QPixmap) вызывается сразу из кэша или позже из GUI-потока."""
+        key = avatar_cache_key(path, size)
+        cached = find_cached_avatar(key)
+        if cached is not None:
+            callback(cached)
+            return
+        self._enqueue(key, path, size, callback)
+
+    def set_label_avatar(self, label, path, size):
+        """Поставить в QLabel заглушку и подменить её готовым аватаром."""
+        key = avatar_cache_key(path, size)
+        # Запоминаем последний запрошенный аватар, чтобы старый ответ его не перетёр
+        label.setProperty("avatar_key", key)
+        cached = find_cached_avatar(key)
+        if cached is not None:
+            label.setPixmap(cached)
+            return
+        label.setPixmap(self.placeholder(size))
+
+        def apply(pixmap):
+            try:
+                if label.property("avatar_key") == key:
+                    label.setPixmap(pixmap)
+            except RuntimeError:
+                # Виджет успели удалить, пока аватар готовился
+                pass
+
+        self._enqueue(key, path, size, apply)
+
+    def _enqueue(self, key, path, size, callback):
+        waiters = self._waiters.get(key)
+        if waiters is not None:
+            waiters.append(callback)
+            return
+        self._waiters[key] = [callback]
+        self._pool.start(_AvatarTask(key, path, size, self._signals))
+
+    def wait_for_done(self, msecs=-1):
+        return self._pool.waitForDone(msecs)
+
+    def _on_finished(self, key, image):
+        pixmap = QPixmap.fromImage(image)
+        QPixmapCache.insert(key, pixmap)
+        for callback in self._waiters.pop(key, []):
+            callback(pixmap)
+
+
+_avatar_loader = None
+
+
+def avatar_loader():
+    """Общий загрузчик (создаётся после QApplication)."""
+    global _avatar_loader
+    if _avatar_loader is None:
+        _avatar_loader = AvatarLoader()
+    return _avatar_loader
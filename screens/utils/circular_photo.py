@@ -1,5 +1,7 @@
+import os
+
 from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QPixmap, QPainter, QPainterPath
+from PyQt6.QtGui import QPixmap, QPainter, QPainterPath, QPixmapCache, QImage
 
 
 def create_circular_pixmap(pixmap, size):
@@ -24,4 +26,72 @@ def create_circular_pixmap(pixmap, size):
     painter.drawPixmap(0, 0, scaled_pixmap)
     painter.end()
 
-    return circular_pixmap
\ No newline at end of file
+    return circular_pixmap
+
+
+def create_circular_image(path, size):
+    """То же, что create_circular_pixmap, но на QImage — можно вызывать не из GUI-потока."""
+    circular_image = QImage(size, size, QImage.Format.Format_ARGB32_Premultiplied)
+    circular_image.fill(Qt.GlobalColor.transparent)
+
+    source = QImage(path)
+    if source.isNull():
+        return circular_image
+
+    painter = QPainter(circular_image)
+    painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+
+    path = QPainterPath()
+    path.addEllipse(0, 0, size, size)
+    painter.setClipPath(path)
+
+    scaled_image = source.scaled(
+        size, size,
+        Qt.AspectRatioMode.KeepAspectRatioByExpanding,
+        Qt.TransformationMode.SmoothTransformation
+    )
+    painter.drawImage(0, 0, scaled_image)
+    painter.end()
+
+    return circular_image
+
+
+# Лимит QPixmapCache в КБ: сотни маленьких круглых аватаров вместо 10 МБ по умолчанию
+AVATAR_CACHE_LIMIT_KB = 32 * 1024
+_cache_limit_applied = False
+
+
+def avatar_cache_key(path, size):
+    global _cache_limit_applied
+    if not _cache_limit_applied:
+        QPixmapCache.setCacheLimit(max(QPixmapCache.cacheLimit(), AVATAR_CACHE_LIMIT_KB))
+        _cache_limit_applied = True
+
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except (OSError, TypeError):
+        mtime = 0
+    return f"avatar:{path}:{mtime}:{size}"
+
+
+def find_cached_avatar(key):
+    cached = QPixmapCache.find(key)
+    if cached is not None and not cached.isNull():
+        return cached
+    return None
+
+
+def circular_avatar(path, size):
+    """Круглый аватар из файла с кэшем по (путь, mtime, размер).
+
+    JPEG декодируется и масштабируется один раз, дальше все виджеты
+    получают общий QPixmap из QPixmapCache.
+    """
+    key = avatar_cache_key(path, size)
+    cached = find_cached_avatar(key)
+    if cached is not None:
+        return cached
+
+    circular_pixmap = create_circular_pixmap(QPixmap(path), size)
+    QPixmapCache.insert(key, circular_pixmap)
+    return circular_pixmap
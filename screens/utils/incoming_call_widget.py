@@ -1,12 +1,12 @@
 import asyncio
 
 from PyQt6.QtCore import Qt, QSize
-from PyQt6.QtGui import QFont, QPixmap, QCursor, QIcon, QKeyEvent
+from PyQt6.QtGui import QFont, QCursor, QIcon, QKeyEvent
 from PyQt6.QtWidgets import QDialog, QLabel, QVBoxLayout, QHBoxLayout, QPushButton
-from backend.avatar_path_getter import find_image_path_by_number
+from api.profile_actions import get_avatar_path
 from backend.call_session import CallSession
 
-from screens.utils.circular_photo import create_circular_pixmap
+from screens.utils.circular_photo import circular_avatar
 from screens.utils.default_avatar import default_ava_path
 from screens.utils.screen_style_sheet import screen_style, load_custom_font
 
@@ -48,10 +48,9 @@ class IncomingCallWidget(QDialog):
         avatar.setAlignment(Qt.AlignmentFlag.AlignCenter)
         avatar.setStyleSheet("background: transparent;")
         # ============================
-        avatar_path = find_image_path_by_number("avatar", self.calling_user_data["id"])
-        pixmap = QPixmap(avatar_path if avatar_path else default_ava_path)
+        avatar_path = get_avatar_path(self.calling_user_data["id"])
         # Преобразуем изображение в круглое
-        circular_pixmap = create_circular_pixmap(pixmap, 70)
+        circular_pixmap = circular_avatar(avatar_path if avatar_path else default_ava_path, 70)
         avatar.setPixmap(circular_pixmap)
         main_layout.addWidget(avatar, alignment=Qt.AlignmentFlag.AlignCenter)
         # ============================
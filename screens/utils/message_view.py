@@ -0,0 +1,348 @@
+from datetime import datetime
+
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex, QRect, QRectF, QSize
+from PyQt6.QtGui import QFont, QFontMetrics, QColor, QPainter, QGuiApplication
+from PyQt6.QtWidgets import QListView, QStyledItemDelegate, QAbstractItemView, QMenu, QFrame
+
+from screens.utils.avatar_loader import avatar_loader
+from screens.utils.default_avatar import default_ava_path
+
+
+class MessageListModel(QAbstractListModel):
+    """Сообщения чата для QListView.
+
+    Строка хранит исходный dict сообщения и признак «первое в группе»,
+    ники и аватары отправителей отдаются через роли, а не через виджеты.
+    """
+
+    MessageRole = Qt.ItemDataRole.UserRole + 1
+    SenderIdRole = Qt.ItemDataRole.UserRole + 2
+    IsOwnRole = Qt.ItemDataRole.UserRole + 3
+    FirstInGroupRole = Qt.ItemDataRole.UserRole + 4
+    NicknameRole = Qt.ItemDataRole.UserRole + 5
+    AvatarPathRole = Qt.ItemDataRole.UserRole + 6
+    TimeRole = Qt.ItemDataRole.UserRole + 7
+
+    def __init__(self, user_id, user_avatar_path=None, receiver_avatar_path=None, is_group=False, parent=None):
+        super().__init__(parent)
+        self.user_id = user_id
+        self.user_avatar_path = user_avatar_path or default_ava_path
+        self.receiver_avatar_path = receiver_avatar_path or default_ava_path
+        self.is_group = is_group
+        self._rows: list[dict] = []
+        self._ids: set = set()
+        self._nicknames: dict = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        message = row["data"]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return message.get("content", "")
+        if role == self.MessageRole:
+            return message
+        if role == self.SenderIdRole:
+            return message.get("sender_id")
+        if role == self.IsOwnRole:
+            return message.get("sender_id") == self.user_id
+        if role == self.FirstInGroupRole:
+            return row["first"]
+        if role == self.NicknameRole:
+            sender_id = message.get("sender_id")
+            return self._nicknames.get(sender_id, "") if self.is_group else ""
+        if role == self.AvatarPathRole:
+            return self.user_avatar_path if message.get("sender_id") == self.user_id else self.receiver_avatar_path
+        if role == self.TimeRole:
+            if "time" not in row:
+                try:
+                    row["time"] = datetime.fromisoformat(message["timestamp"]).strftime("%H:%M")
+                except (KeyError, TypeError, ValueError):
+                    row["time"] = ""
+            return row["time"]
+        return None
+
+    def row_dict(self, row):
+        """Служебная запись строки (в ней делегат кэширует раскладку текста)."""
+        return self._rows[row]
+
+    def last_sender_id(self):
+        return self._rows[-1]["data"].get("sender_id") if self._rows else None
+
+    def oldest_message(self):
+        return self._rows[0]["data"] if self._rows else None
+
+    def row_of(self, message):
+        """Номер строки с этим dict сообщения (после merge_messages строки переставлены)."""
+        for row, item in enumerate(self._rows):
+            if item["data"] is message:
+                return row
+        return None
+
+    def _only_new(self, messages):
+        # Страницы истории и живые сообщения могут пересекаться — дубли по _id отбрасываем
+        fresh = []
+        for message in messages:
+            message_id = message.get("_id")
+            if message_id is not None:
+                if message_id in self._ids:
+                    continue
+                self._ids.add(message_id)
+            fresh.append(message)
+        return fresh
+
+    @staticmethod
+    def _make_rows(messages, prev_sender_id=None):
+        rows = []
+        for message in messages:
+            sender_id = message.get("sender_id")
+            rows.append({"data": message, "first": sender_id != prev_sender_id})
+            prev_sender_id = sender_id
+        return rows
+
+    def append_messages(self, messages):
+        """Добавить сообщения в конец (в хронологическом порядке) одной вставкой."""
+        messages = self._only_new(messages)
+        if messages:
+            self._append_rows(messages)
+
+    def prepend_messages(self, messages):
+        """Добавить более старые сообщения в начало одной вставкой.
+
+        Возвращает число реально вставленных строк.
+        """
+        messages = self._only_new(messages)
+        if not messages:
+            return 0
+        rows = self._make_rows(messages)
+        self.beginInsertRows(QModelIndex(), 0, len(rows) - 1)
+        self._rows[:0] = rows
+        self.endInsertRows()
+        # Бывшая первая строка могла оказаться продолжением группы
+        boundary = len(rows)
+        if boundary < len(self._rows):
+            old_first = self._rows[boundary]
+            still_first = old_first["data"].get("sender_id") != rows[-1]["data"].get("sender_id")
+            if old_first["first"] != still_first:
+                old_first["first"] = still_first
+                old_first.pop("layout", None)
+                index = self.index(boundary)
+                self.dataChanged.emit(index, index, [self.FirstInGroupRole])
+        return len(rows)
+
+    def merge_messages(self, messages):
+        """Слить страницу с уже показанными строками (кэш с диска, живые сообщения) по времени."""
+        messages = self._only_new(messages)
+        if not messages:
+            return 0
+        if not self._rows:
+            self._append_rows(messages)
+            return len(messages)
+        rows = self._rows + [{"data": message, "first": True} for message in messages]
+        # Сортировка устойчивая: при равном времени порядок прихода сохраняется
+        rows.sort(key=lambda row: row["data"].get("timestamp") or "")
+        prev_sender_id = None
+        for row in rows:
+            sender_id = row["data"].get("sender_id")
+            first = sender_id != prev_sender_id
+            if row["first"] != first:
+                row["first"] = first
+                row.pop("layout", None)
+            prev_sender_id = sender_id
+        self.beginResetModel()
+        self._rows = rows
+        self.endResetModel()
+        return len(messages)
+
+    def _append_rows(self, messages):
+        rows = self._make_rows(messages, self.last_sender_id())
+        start = len(self._rows)
+        self.beginInsertRows(QModelIndex(), start, start + len(rows) - 1)
+        self._rows.extend(rows)
+        self.endInsertRows()
+
+    def set_nickname(self, sender_id, nickname):
+        if self._nicknames.get(sender_id) == nickname:
+            return
+        self._nicknames[sender_id] = nickname
+        if not self.is_group:
+            return
+        for row, item in enumerate(self._rows):
+            if item["first"] and item["data"].get("sender_id") == sender_id:
+                index = self.index(row)
+                self.dataChanged.emit(index, index, [self.NicknameRole])
+
+    def has_nickname(self, sender_id):
+        return sender_id in self._nicknames
+
+    def clear(self):
+        self.beginResetModel()
+        self._rows.clear()
+        self._ids.clear()
+        self.endResetModel()
+
+
+class MessageDelegate(QStyledItemDelegate):
+    """Рисует пузырь сообщения вместо дерева QWidget/QLabel на каждую строку.
+
+    Размер текста считается один раз для ширины вьюпорта и хранится в строке
+    модели, поэтому прокрутка не пересчитывает переносы.
+    """
+
+    AVATAR_SIZE = 40
+    MAX_TEXT_WIDTH = 700
+    MARGIN = 5
+    SPACING = 5
+    PADDING_H = 10
+    PADDING_V = 6
+    BUBBLE_MIN_HEIGHT = 40
+    RADIUS = 12
+    OWN_COLOR = QColor("#312b33")
+    OTHER_COLOR = QColor("#141015")
+
+    def __init__(self, view):
+        super().__init__(view)
+        self.view = view
+        self.text_font = QFont("Inter", 11, QFont.Weight.Normal)
+        self.time_font = QFont("Inter", 8, QFont.Weight.Normal)
+        self.nickname_font = QFont("Inter")
+        self.nickname_font.setPixelSize(11)
+        self.text_metrics = QFontMetrics(self.text_font)
+        self.time_metrics = QFontMetrics(self.time_font)
+        self.nickname_height = QFontMetrics(self.nickname_font).height() + 2
+        self.time_width = self.time_metrics.horizontalAdvance("00:00")
+        self._avatars = {}
+        self._pending_avatars = set()
+
+    # ================= Раскладка =================
+    def _max_text_width(self):
+        fixed = (self.MARGIN * 2 + self.AVATAR_SIZE + self.SPACING
+                 + self.PADDING_H * 2 + self.SPACING + self.time_width)
+        return max(min(self.MAX_TEXT_WIDTH, self.view.viewport().width() - fixed), 50)
+
+    def _layout(self, index):
+        """(верхний отступ, высота ника, размер текста) с кэшем по ширине."""
+        row = index.model().row_dict(index.row())
+        max_width = self._max_text_width()
+        cached = row.get("layout")
+        if cached is not None and cached[0] == max_width:
+            return cached[1]
+
+        first = row["first"]
+        top = 10 if first else 2
+        nickname_height = self.nickname_height if first and index.model().is_group else 0
+        text_rect = self.text_metrics.boundingRect(
+            QRect(0, 0, max_width, 1_000_000),
+            Qt.TextFlag.TextWordWrap,
+            row["data"].get("content", ""),
+        )
+        layout = (top, nickname_height, QSize(text_rect.width(), text_rect.height()))
+        row["layout"] = (max_width, layout)
+        return layout
+
+    def sizeHint(self, option, index):
+        top, nickname_height, text_size = self._layout(index)
+        bubble_height = max(text_size.height() + self.PADDING_V * 2, self.BUBBLE_MIN_HEIGHT)
+        return QSize(self.view.viewport().width(), top + nickname_height + bubble_height)
+
+    # ================= Отрисовка =================
+    def _avatar(self, path):
+        pixmap = self._avatars.get(path)
+        if pixmap is not None:
+            return pixmap
+        if path not in self._pending_avatars:
+            self._pending_avatars.add(path)
+
+            def ready(ready_pixmap, path=path):
+                self._avatars[path] = ready_pixmap
+                self._pending_avatars.discard(path)
+                self.view.viewport().update()
+
+            avatar_loader().request(path, self.AVATAR_SIZE, ready)
+            pixmap = self._avatars.get(path)
+            if pixmap is not None:
+                return pixmap
+        return avatar_loader().placeholder(self.AVATAR_SIZE)
+
+    def paint(self, painter, option, index):
+        top, nickname_height, text_size = self._layout(index)
+        model = index.model()
+        rect = option.rect
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+
+        x = rect.left() + self.MARGIN
+        y = rect.top() + top
+
+        if nickname_height:
+            painter.setFont(self.nickname_font)
+            painter.setPen(QColor("gray"))
+            painter.drawText(
+                QRect(x + self.AVATAR_SIZE + self.SPACING, y, rect.width(), nickname_height),
+                Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter,
+                model.data(index, MessageListModel.NicknameRole),
+            )
+            y += nickname_height
+
+        if model.data(index, MessageListModel.FirstInGroupRole):
+            painter.drawPixmap(x, y, self._avatar(model.data(index, MessageListModel.AvatarPathRole)))
+
+        bubble_x = x + self.AVATAR_SIZE + self.SPACING
+        bubble_height = max(text_size.height() + self.PADDING_V * 2, self.BUBBLE_MIN_HEIGHT)
+        bubble_width = self.PADDING_H * 2 + text_size.width() + self.SPACING + self.time_width
+        is_own = model.data(index, MessageListModel.IsOwnRole)
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(self.OWN_COLOR if is_own else self.OTHER_COLOR)
+        painter.drawRoundedRect(QRectF(bubble_x, y, bubble_width, bubble_height), self.RADIUS, self.RADIUS)
+
+        painter.setFont(self.text_font)
+        painter.setPen(QColor("white"))
+        text_y = y + (bubble_height - text_size.height()) // 2
+        painter.drawText(
+            QRect(bubble_x + self.PADDING_H, text_y, text_size.width(), text_size.height()),
+            Qt.TextFlag.TextWordWrap,
+            model.data(index, Qt.ItemDataRole.DisplayRole),
+        )
+
+        painter.setFont(self.time_font)
+        painter.setPen(QColor("gray"))
+        painter.drawText(
+            QRect(bubble_x + bubble_width - self.PADDING_H - self.time_width, y,
+                  self.time_width, bubble_height - self.PADDING_V),
+            Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignBottom,
+            model.data(index, MessageListModel.TimeRole),
+        )
+        painter.restore()
+
+
+class MessageListView(QListView):
+    """Виртуализированный список сообщений: рисуются только видимые строки."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setUniformItemSizes(False)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.verticalScrollBar().setSingleStep(20)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setResizeMode(QListView.ResizeMode.Adjust)
+        self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.setFocusPolicy(Qt.FocusPolicy.NoFocus)
+        self.setFrameShape(QFrame.Shape.NoFrame)
+        self.setStyleSheet("background-color: #272428;")
+        self.setItemDelegate(MessageDelegate(self))
+        # Выделять текст в пузыре нельзя, поэтому копирование — через контекстное меню
+        self.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.customContextMenuRequested.connect(self.show_context_menu)
+
+    def show_context_menu(self, pos):
+        index = self.indexAt(pos)
+        if not index.isValid():
+            return
+        menu = QMenu(self)
+        copy_action = menu.addAction("Копировать текст")
+        if menu.exec(self.viewport().mapToGlobal(pos)) == copy_action:
+            QGuiApplication.clipboard().setText(index.data(Qt.ItemDataRole.DisplayRole))
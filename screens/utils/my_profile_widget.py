@@ -1,11 +1,11 @@
 import asyncio
 from PyQt6.QtCore import Qt, QRectF, QSize
-from PyQt6.QtGui import QPixmap, QFont, QPainter, QPainterPath, QLinearGradient, QColor, QIcon, QCursor
+from PyQt6.QtGui import QFont, QPainter, QPainterPath, QLinearGradient, QColor, QIcon, QCursor
 from PyQt6.QtWidgets import QWidget, QLabel, QPushButton, QHBoxLayout, QVBoxLayout
 from click import clear
 
-from api.profile_actions import download_avatar
-from screens.utils.circular_photo import create_circular_pixmap
+from api.profile_actions import download_avatar, get_avatar_path
+from screens.utils.circular_photo import circular_avatar
 from screens.utils.default_avatar import default_ava_path
 from screens.utils.screen_style_sheet import load_custom_font
 
@@ -108,14 +108,14 @@ class MyProfile(QWidget):
         painter.end()
 
     async def input_data(self, data):
-        print("input data вызван - ", data)
-        self.avatar_path = None
-        self.username.clear()
-        self.unique_name.clear()
         profile_data = data.get("profile_data", {})
-        self.avatar_path = await download_avatar(profile_data.get("id"))
-        pixmap = QPixmap(self.avatar_path or default_ava_path)
-        circular_pixmap = create_circular_pixmap(pixmap, 70)
+        self.sync_input_data(data, await download_avatar(profile_data.get("id")))
+
+    def sync_input_data(self, data, avatar_path=None):
+        """Без сети: аватар только из дискового кэша (тёплый старт до проверки токена)."""
+        profile_data = data.get("profile_data", {})
+        self.avatar_path = avatar_path or get_avatar_path(profile_data.get("id"))
+        circular_pixmap = circular_avatar(self.avatar_path or default_ava_path, 70)
         self.avatar.setPixmap(circular_pixmap)
         self.username.setText(profile_data.get("nickname", "Имя"))
         self.unique_name.setText(profile_data.get("unique_name", "user"))
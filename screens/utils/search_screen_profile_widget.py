@@ -1,8 +1,8 @@
 from PyQt6.QtCore import Qt, QSize, QRectF
-from PyQt6.QtGui import QPixmap, QFont, QPainter, QPainterPath, QLinearGradient, QColor
+from PyQt6.QtGui import QFont, QPainter, QPainterPath, QLinearGradient, QColor
 from PyQt6.QtWidgets import QWidget, QLabel, QHBoxLayout, QVBoxLayout
 from api.profile_actions import get_current_user, download_avatar
-from screens.utils.circular_photo import create_circular_pixmap
+from screens.utils.circular_photo import circular_avatar
 from screens.utils.default_avatar import default_ava_path
 from screens.utils.screen_style_sheet import load_custom_font
 
@@ -106,10 +106,9 @@ class SearchScreenProfileWidget(QWidget):
 
     async def input_data(self, data, unique_name):
         self.avatar_path = await download_avatar(data.get("id"))
-        pixmap = QPixmap(self.avatar_path if self.avatar_path else default_ava_path)
 
         # Create circular pixmap
-        circular_pixmap = create_circular_pixmap(pixmap, 70)
+        circular_pixmap = circular_avatar(self.avatar_path if self.avatar_path else default_ava_path, 70)
         self.avatar.setPixmap(circular_pixmap)
 
         self.username.setText(data.get("nickname", "Имя"))
@@ -117,10 +116,9 @@ class SearchScreenProfileWidget(QWidget):
 
     def sync_input_data(self, data):
         self.avatar_path = data["avatar_path"]
-        pixmap = QPixmap(self.avatar_path if self.avatar_path else default_ava_path)
 
         # Create circular pixmap
-        circular_pixmap = create_circular_pixmap(pixmap, 70)
+        circular_pixmap = circular_avatar(self.avatar_path if self.avatar_path else default_ava_path, 70)
         self.avatar.setPixmap(circular_pixmap)
 
         self.username.setText(data.get("nickname", "Имя"))
\ No newline at end of file
@@ -0,0 +1,58 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+pytest.importorskip("aiortc")
+pytest.importorskip("av")
+try:
+    import sounddevice  # noqa: F401
+except (ImportError, OSError):
+    pytest.skip("sounddevice/PortAudio недоступны", allow_module_level=True)
+
+from backend.microphone_stream import AudioStreamTrack
+
+FRAME_SIZE = 960
+SAMPLE_RATE = 48000
+BLOCK_SECONDS = FRAME_SIZE / SAMPLE_RATE
+
+
+class FedTrack(AudioStreamTrack):
+    def _init_microphone(self):
+        # Без звуковой карты: блоки подаёт тест через _audio_callback
+        self.stream = True
+
+
+async def feed(track, blocks, stall_at=None):
+    block = np.full((FRAME_SIZE, 1), 0.1, dtype=np.float32)
+    for index in range(blocks):
+        # recv уже ждёт следующий блок — обычный темп захвата, без опоры на таймеры
+        while track._waiter is None:
+            await asyncio.sleep(0)
+        if index == stall_at:
+            # Захват застрял дольше срока блока
+            await asyncio.sleep(3 * BLOCK_SECONDS)
+        track._audio_callback(block, FRAME_SIZE, None, None)
+
+
+async def consume(track, frames):
+    for _ in range(frames):
+        await track.recv()
+
+
+def run_call(blocks, **feed_kwargs):
+    async def run():
+        track = FedTrack(sample_rate=SAMPLE_RATE, frame_size=FRAME_SIZE)
+        await asyncio.gather(feed(track, blocks, **feed_kwargs), consume(track, blocks))
+        return track.get_stats()
+    return asyncio.run(run())
+
+
+def test_steady_capture_reports_no_underruns():
+    # recv приходит раньше каждого блока — это не нехватка данных
+    assert run_call(50)["underruns"] == 0
+
+
+def test_stalled_capture_reports_underrun():
+    stats = run_call(20, stall_at=10)
+    assert stats["underruns"] == 1
@@ -0,0 +1,47 @@
+import asyncio
+
+import httpx
+
+from api import common
+
+CONCURRENT_REQUESTS = 100
+
+
+def test_concurrent_401_trigger_single_refresh(tmp_path, monkeypatch):
+    token_manager = common.token_manager
+    monkeypatch.setattr(token_manager, "token_path", str(tmp_path / "token.json"))
+    monkeypatch.setattr(token_manager, "use_keyring", False)
+    # monkeypatch вернёт токены синглтона после теста
+    monkeypatch.setattr(token_manager, "access_token", "access-old")
+    monkeypatch.setattr(token_manager, "_refresh_token", "refresh-old")
+    monkeypatch.setattr(token_manager, "_refresh_token_loaded", True)
+
+    refreshes = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal refreshes
+        if request.url.path == "/auth/refresh":
+            refreshes += 1
+            # Медленный refresh: остальные 401 успевают прийти, пока он идёт
+            await asyncio.sleep(0.05)
+            return httpx.Response(200, json={"access_token": "access-new"},
+                                  headers={"set-cookie": "refresh_token=refresh-new"})
+        if request.headers.get("Authorization") == "Bearer access-new":
+            return httpx.Response(200, json={"id": 1})
+        return httpx.Response(401)
+
+    async def run():
+        monkeypatch.setattr(common, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        try:
+            return await asyncio.gather(*(
+                common.authorized_request("GET", f"{common.URL}user/me") for _ in range(CONCURRENT_REQUESTS)
+            ))
+        finally:
+            await common.close_client()
+
+    responses = asyncio.run(run())
+
+    assert refreshes == 1
+    assert all(response.status_code == 200 for response in responses)
+    assert token_manager.get_access_token() == "access-new"
+    assert token_manager.get_refresh_token() == "refresh-new"